@@ -1 +1,17 @@
 __version__ = "0.2.1"
+
+from nr_wg_mtu_finder.errors import ReturncodeError
+from nr_wg_mtu_finder.models import MTUFinderConfig, MTUResult
+
+
+def __getattr__(name):
+    """Import `MTUFinder` lazily.
+
+    `nr_wg_mtu_finder.mtu_finder` pulls in matplotlib, seaborn, flask, requests and
+    pandas, which every script would otherwise pay for on startup.
+    """
+    if name == "MTUFinder":
+        from nr_wg_mtu_finder.mtu_finder import MTUFinder
+
+        return MTUFinder
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+
+from nr_wg_mtu_finder.log import INDEX, METRICS, read_log
+
+
+def aggregate_logs(log_filepaths):
+    """Read one or more log files (csv) and take the median bandwidth of every pair.
+
+    Failed tests are NaN and are ignored by the median, so a pair is only NaN if it
+    failed in every log file. The `n_logs` column counts the log files that tested the
+    pair, whether the test failed or not.
+    """
+    df = pd.concat([read_log(log_filepath) for log_filepath in log_filepaths])
+    grouped = df.groupby(level=INDEX)
+    return grouped.median().assign(n_logs=grouped.size())
+
+
+def to_grids(df):
+    """Pivot the metrics into a single array of shape (metric, server_mtu, peer_mtu).
+
+    Pairs that are not in any log file are NaN in `grids` and False in the array
+    `measured` of shape (server_mtu, peer_mtu).
+
+    Returns:
+        A tuple (grids, measured, server_mtus, peer_mtus).
+    """
+    pivoted = df[list(METRICS) + ["n_logs"]].unstack(level="peer_mtu")
+    server_mtus = pivoted.index.to_numpy()
+    peer_mtus = pivoted["n_logs"].columns.to_numpy()
+    grids = np.stack([pivoted[metric].to_numpy() for metric in METRICS])
+    measured = pivoted["n_logs"].notna().to_numpy()
+    return grids, measured, server_mtus, peer_mtus
+
+
+def minimum_filter(grids, measured, size):
+    """Take the minimum over the `size` x `size` neighbourhood of every pair.
+
+    Pairs outside of the grid and pairs that were not measured are ignored. Failed
+    pairs (NaN) count as 0 Mbps so that a pair next to a failed pair is never
+    considered robust.
+    """
+    radius = size // 2
+    n_server, n_peer = grids.shape[-2:]
+    padded = np.pad(
+        np.where(measured, np.nan_to_num(grids, nan=0.0), np.inf),
+        [(0, 0)] * (grids.ndim - 2) + [(radius, radius), (radius, radius)],
+        constant_values=np.inf,
+    )
+    return np.minimum.reduce(
+        [
+            padded[..., i : i + n_server, j : j + n_peer]
+            for i in range(size)
+            for j in range(size)
+        ]
+    )
+
+
+def find_dead_zones(dead, server_mtus, peer_mtus):
+    """Group the dead pairs of a grid into runs of consecutive peer MTUs.
+
+    Returns:
+        A list of dicts with the keys 'server_mtu', 'peer_mtu_min' and 'peer_mtu_max'.
+    """
+    padded = np.pad(dead.astype(np.int8), [(0, 0), (1, 1)])
+    edges = np.diff(padded, axis=1)
+    starts_row, starts_col = np.nonzero(edges == 1)
+    _, ends_col = np.nonzero(edges == -1)
+    return [
+        {
+            "server_mtu": int(server_mtus[row]),
+            "peer_mtu_min": int(peer_mtus[start]),
+            "peer_mtu_max": int(peer_mtus[end - 1]),
+        }
+        for row, start, end in zip(starts_row, starts_col, ends_col)
+    ]
+
+
+def get_pair(grid, server_mtus, peer_mtus):
+    """Get the (server_mtu, peer_mtu) and index of the max of a grid, ignoring NaN."""
+    row, col = np.unravel_index(np.nanargmax(grid), grid.shape)
+    return int(server_mtus[row]), int(peer_mtus[col]), row, col
+
+
+def to_json_number(value):
+    """Round a value to 3 decimals, or None if it is NaN since NaN is not valid json."""
+    return None if np.isnan(value) else round(float(value), 3)
+
+
+def recommend_mtu(log_filepaths, neighbourhood=3, dead_zone_fraction=0.1):
+    """Recommend the best and the most robust MTU pairs from one or more sweeps.
+
+    - best: The pair with the highest bandwidth.
+    - robust: The pair with the highest bandwidth in its worst neighbour, i.e. the max
+      after a minimum filter of `neighbourhood` x `neighbourhood` pairs. This avoids
+      recommending a pair that sits right next to a dead zone.
+    - dead zones: Pairs that failed or whose bandwidth is below `dead_zone_fraction`
+      of the best bandwidth of the metric. Pairs that are not in any log file were
+      never measured and are not dead zones.
+
+    The overall recommendation uses the bandwidth of every metric relative to its best
+    bandwidth and takes the worst metric of every pair.
+
+    Returns:
+        A dict that can be dumped to json.
+    """
+    df = aggregate_logs(log_filepaths=log_filepaths)
+    grids, measured, server_mtus, peer_mtus = to_grids(df)
+    if np.isnan(grids).all(axis=(1, 2)).any():
+        raise ValueError(
+            f"Expected to find at least one successful test for every metric in "
+            f"{log_filepaths} but none was found."
+        )
+
+    best_mbps = np.nanmax(grids, axis=(1, 2), keepdims=True)
+    with np.errstate(invalid="ignore"):
+        dead = measured & (np.isnan(grids) | (grids < dead_zone_fraction * best_mbps))
+    # Only pairs with a successful test can be recommended as robust.
+    robust_grids = np.where(
+        np.isnan(grids), np.nan, minimum_filter(grids, measured, size=neighbourhood)
+    )
+    near_dead = (
+        minimum_filter(np.where(dead, 0.0, 1.0), measured, size=neighbourhood) == 0
+    )
+
+    result = {
+        "log_filepaths": list(log_filepaths),
+        "neighbourhood": neighbourhood,
+        "dead_zone_fraction": dead_zone_fraction,
+        "n_unmeasured_pairs": int((~measured).sum()),
+        "metrics": {},
+    }
+    for i, metric in enumerate(METRICS):
+        best_server_mtu, best_peer_mtu, row, col = get_pair(
+            grids[i], server_mtus, peer_mtus
+        )
+        best = {
+            "server_mtu": best_server_mtu,
+            "peer_mtu": best_peer_mtu,
+            "mbps": to_json_number(grids[i, row, col]),
+        }
+
+        robust_server_mtu, robust_peer_mtu, row, col = get_pair(
+            robust_grids[i], server_mtus, peer_mtus
+        )
+        # If every pair has a failed neighbour, then no pair is robust.
+        robust = None
+        if robust_grids[i, row, col] > 0:
+            robust = {
+                "server_mtu": robust_server_mtu,
+                "peer_mtu": robust_peer_mtu,
+                "mbps": to_json_number(grids[i, row, col]),
+                "worst_neighbour_mbps": to_json_number(robust_grids[i, row, col]),
+                "near_dead_zone": bool(near_dead[i, row, col]),
+            }
+
+        result["metrics"][metric] = {
+            "best": best,
+            "robust": robust,
+            "n_dead_pairs": int(dead[i].sum()),
+            "dead_zones": find_dead_zones(dead[i], server_mtus, peer_mtus),
+        }
+
+    with np.errstate(invalid="ignore"):
+        scores = np.min(np.nan_to_num(grids / best_mbps, nan=0.0), axis=0)
+    robust_scores = np.where(
+        measured, minimum_filter(scores, measured, size=neighbourhood), np.nan
+    )
+    server_mtu, peer_mtu, row, col = get_pair(robust_scores, server_mtus, peer_mtus)
+    result["overall"] = None
+    if robust_scores[row, col] > 0:
+        result["overall"] = {
+            "server_mtu": server_mtu,
+            "peer_mtu": peer_mtu,
+            "score": to_json_number(scores[row, col]),
+            "worst_neighbour_score": to_json_number(robust_scores[row, col]),
+            "near_dead_zone": bool(near_dead[:, row, col].any()),
+        }
+
+    return result
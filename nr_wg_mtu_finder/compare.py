@@ -0,0 +1,179 @@
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+from nr_wg_mtu_finder.log import INDEX, METRICS, read_log
+
+
+def get_run_labels(log_filepaths):
+    """Label every run by the filename of its log file (csv) without extension.
+
+    The position of the log file is prepended if two log files share the same name.
+    """
+    labels = [os.path.splitext(os.path.basename(path))[0] for path in log_filepaths]
+    if len(set(labels)) != len(labels):
+        labels = [f"{i}_{label}" for i, label in enumerate(labels)]
+    return labels
+
+
+def align_logs(log_filepaths):
+    """Align multiple log files (csv) on (server_mtu, peer_mtu).
+
+    The logs are outer joined so that grids which only partly overlap are kept.
+
+    Returns:
+        A tuple (aligned, failed).
+            - aligned: Frame indexed by (server_mtu, peer_mtu) with (run, metric)
+              columns. Pairs that failed or that are missing from a log are NaN.
+            - failed: Boolean frame like `aligned` which is True for pairs that are in
+              a log but failed.
+    """
+    labels = get_run_labels(log_filepaths)
+    logs = [read_log(log_filepath) for log_filepath in log_filepaths]
+    aligned = pd.concat(
+        logs, axis=1, keys=labels, names=["run", "metric"], join="outer"
+    )
+    failed = (
+        pd.concat(
+            [log.isna() for log in logs],
+            axis=1,
+            keys=labels,
+            names=["run", "metric"],
+            join="outer",
+        )
+        .reindex(aligned.index)
+        .fillna(False)
+        .astype(bool)
+    )
+    return aligned, failed
+
+
+def compare_logs(aligned, failed, rel_threshold=0.1, abs_threshold=10.0):
+    """Compare every run against the first (baseline) run.
+
+    A pair has changed significantly if its bandwidth changed by at least
+    `rel_threshold` (relative to the baseline) and at least `abs_threshold` Mbps. The
+    ratio to a baseline of 0 Mbps is infinite, so a dead pair that came back to life
+    counts as changed. Pairs that failed in the baseline but not in the run, or the
+    other way around, are always reported.
+
+    Returns:
+        A tuple (deltas, ratios, summary).
+            - deltas: Frame like `aligned` with the difference to the baseline (Mbps).
+            - ratios: Frame like `aligned` with the ratio to the baseline.
+            - summary: Long frame with one row per significantly changed pair. Its
+              `change` column is one of 'up', 'down', 'recovered' (failed in the
+              baseline) or 'failed' (failed in the run).
+    """
+    runs = list(aligned.columns.unique(level="run"))
+    baseline = aligned[runs[0]]
+
+    def to_runs(frame):
+        """Repeat a baseline frame for every run."""
+        return frame.reindex(columns=aligned.columns, level="metric")
+
+    deltas = aligned - to_runs(baseline)
+    ratios = aligned / to_runs(baseline)
+    significant = (deltas.abs() >= abs_threshold) & (
+        (ratios - 1).abs() >= rel_threshold
+    )
+    recovered = to_runs(failed[runs[0]]) & aligned.notna()
+    broken = failed & to_runs(baseline.notna())
+
+    summaries = []
+    for run in runs[1:]:
+        for metric in METRICS:
+            column = (run, metric)
+            mask = significant[column] | recovered[column] | broken[column]
+            change = np.select(
+                [recovered[column], broken[column], deltas[column] > 0],
+                ["recovered", "failed", "up"],
+                default="down",
+            )
+            summaries.append(
+                pd.DataFrame(
+                    {
+                        "run": run,
+                        "metric": metric,
+                        "change": change[mask.to_numpy()],
+                        "baseline_mbps": baseline.loc[mask, metric],
+                        "mbps": aligned.loc[mask, column],
+                        "delta_mbps": deltas.loc[mask, column],
+                        "ratio": ratios.loc[mask, column],
+                    }
+                )
+            )
+    summary = pd.concat(summaries).reset_index()[
+        ["run", "metric"]
+        + INDEX
+        + ["change", "baseline_mbps", "mbps", "delta_mbps", "ratio"]
+    ]
+
+    return deltas, ratios, summary
+
+
+def create_comparison_heatmap(deltas, ratios, run, heatmap_filepath):
+    """Plot the delta and ratio heatmaps of every metric of a run."""
+    f, axes = plt.subplots(nrows=len(METRICS), ncols=2, figsize=(12, 6 * len(METRICS)))
+
+    for row, (metric, title) in enumerate(METRICS.items()):
+        for col, (frame, name, center, cmap) in enumerate(
+            [
+                (deltas, "Delta (Mbps)", 0, "RdBu"),
+                (ratios, "Ratio", 1, "RdBu"),
+            ]
+        ):
+            ax = axes[row, col]
+            # An infinite ratio to a baseline of 0 Mbps cannot be colored.
+            dfx = (
+                frame[(run, metric)]
+                .replace([np.inf, -np.inf], np.nan)
+                .unstack(level="peer_mtu")
+            )
+            sns.heatmap(
+                dfx.values,
+                linewidth=0.5,
+                ax=ax,
+                cmap=cmap,
+                center=center,
+                xticklabels=list(dfx.columns),
+                yticklabels=list(dfx.index),
+            )
+            ax.tick_params(axis="x", rotation=45)
+            ax.tick_params(axis="y", rotation=0)
+            ax.set(ylabel="Server MTU", xlabel="Peer MTU")
+            ax.set_title(f"{title}: {name}")
+            ax.invert_yaxis()
+
+    f.suptitle(f"Peer MTU vs Server MTU Bandwidth: '{run}' vs baseline")
+    f.tight_layout()
+    f.savefig(heatmap_filepath, dpi=300)
+    plt.close(f)
+
+    print(
+        f"create_comparison_heatmap: Done generating comparison heatmap. Heatmap "
+        f"can be found at '{heatmap_filepath}'"
+    )
+
+
+def print_comparison_summary(aligned, deltas, summary):
+    """Print per run and metric how many pairs overlap and changed significantly."""
+    runs = list(aligned.columns.unique(level="run"))
+    for run in runs[1:]:
+        print("-" * 80)
+        print(f"Run '{run}' vs baseline '{runs[0]}'")
+        for metric in METRICS:
+            overlap = int(deltas[(run, metric)].notna().sum())
+            changed = summary[(summary["run"] == run) & (summary["metric"] == metric)]
+            n_changes = changed["change"].value_counts()
+            median = deltas[(run, metric)].median()
+            print(
+                f"{metric:<50s}: {overlap} overlapping pairs, "
+                f"{n_changes.get('up', 0)} up, {n_changes.get('down', 0)} down, "
+                f"{n_changes.get('recovered', 0)} recovered, "
+                f"{n_changes.get('failed', 0)} failed, "
+                f"median delta {median:0.3f} Mbps"
+            )
@@ -0,0 +1,14 @@
+# Errors that are likely to go away on their own and are therefore worth a retry.
+TRANSIENT_STATUSES = ("timeout", "unreachable", "busy")
+
+
+class ReturncodeError(Exception):
+    def __init__(self, status="error"):
+        """Init.
+
+        Args:
+            status: One of 'timeout', 'unreachable', 'busy' or 'error'. The status is
+                also recorded in the log file (csv) when the error is skipped.
+        """
+        super().__init__(status)
+        self.status = status
@@ -0,0 +1,241 @@
+import json
+import os
+import subprocess
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Union
+
+from pydantic import BaseModel, StrictStr, root_validator, validator
+from typing_extensions import Literal
+
+
+class FleetTargetModel(BaseModel):
+    """A single WG interface/server pair that is swept by the fleet."""
+
+    interface: StrictStr
+    name: Optional[StrictStr] = None
+    conf_file: Optional[StrictStr] = None
+
+    server_ip: StrictStr
+    server_port: int = 5000
+    iperf3_port: int = 5201
+    builtin_port: int = 5202
+
+    # Targets that share the same underlay link are run one after another so that
+    # they do not skew each other's throughput.
+    link: Optional[StrictStr] = None
+
+    @validator("name", always=True)
+    def default_name(cls, name, values):
+        """Default the name of the target to its interface."""
+        return name or values.get("interface")
+
+    @validator("conf_file", always=True)
+    def default_conf_file(cls, conf_file, values):
+        """Default the conf file to the wg-quick conf file of the interface."""
+        return conf_file or f"/etc/wireguard/{values.get('interface')}.conf"
+
+
+class FleetModel(BaseModel):
+    mode: Literal["server", "peer"] = "peer"
+    mtu_min: int
+    mtu_max: int
+    mtu_step: int
+
+    max_parallel: int = 1
+    output_dir: StrictStr = "."
+
+    # Extra CLI options that are passed as is to every `nr-wg-mtu-finder` process.
+    # Example: {"peer-skip-errors": "False"}
+    options: Dict[StrictStr, Union[StrictStr, int, float]] = {}
+
+    targets: List[FleetTargetModel]
+
+    @root_validator(pre=False)
+    def validate_fleet(cls, values):
+        """Generic validations."""
+        mode, max_parallel, targets = (
+            values.get("mode", None),
+            values.get("max_parallel", None),
+            values.get("targets", None),
+        )
+
+        if max_parallel is not None and max_parallel < 1:
+            raise ValueError(f"max_parallel: {max_parallel} must be at least 1.")
+
+        if not targets:
+            raise ValueError("targets: At least one target must be configured.")
+
+        names = [target.name for target in targets]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"targets: Target names must be unique: {duplicates}")
+
+        sync_addresses = [(target.server_ip, target.server_port) for target in targets]
+        if len(set(sync_addresses)) != len(sync_addresses):
+            raise ValueError(
+                "targets: Every target must use a unique (server_ip, server_port) "
+                "for its sync server."
+            )
+
+        # `iperf3 -s` and the built-in throughput server listen on all addresses,
+        # therefore on the WG server every target needs its own ports.
+        for field in ["iperf3_port", "builtin_port"]:
+            ports = [getattr(target, field) for target in targets]
+            if mode == "server" and len(set(ports)) != len(ports):
+                raise ValueError(
+                    f"targets: In 'server' mode every target must use a unique {field}."
+                )
+
+        # Targets that share an interface or a conf file would spin the same interface
+        # down and up at the same time, unless they share a `link` and therefore run
+        # one after another.
+        for field, get_value in [
+            ("interface", lambda target: target.interface),
+            ("conf_file", lambda target: os.path.abspath(target.conf_file)),
+        ]:
+            links = {}
+            for target in targets:
+                links.setdefault(get_value(target), []).append(target.link)
+            shared = sorted(
+                value
+                for value, value_links in links.items()
+                if len(value_links) > 1
+                and (None in value_links or len(set(value_links)) > 1)
+            )
+            if shared:
+                raise ValueError(
+                    f"targets: Targets that share the same {field} must share the "
+                    f"same link so that they run one after another: {shared}"
+                )
+
+        # An iperf3 server runs one test at a time, therefore peers that test against
+        # the same iperf3 server would fail with "server is busy". Peers that reach the
+        # same WG server test against different server processes, which cannot share
+        # a built-in throughput server port either.
+        for field in ["iperf3_port", "builtin_port"]:
+            addresses = [
+                (target.server_ip, getattr(target, field)) for target in targets
+            ]
+            if mode == "peer" and len(set(addresses)) != len(addresses):
+                raise ValueError(
+                    f"targets: In 'peer' mode every target must use a unique "
+                    f"(server_ip, {field})."
+                )
+
+        return values
+
+
+def load_fleet_config(config_filepath):
+    """Load and validate a fleet config file (json)."""
+    with open(config_filepath, "r") as f:
+        return FleetModel(**json.load(f))
+
+
+def group_targets(targets):
+    """Group targets that must be run one after another.
+
+    Targets that share the same `link` end up in the same group. Targets without a
+    `link` end up in a group of their own.
+    """
+    groups = OrderedDict()
+    for target in targets:
+        key = ("link", target.link) if target.link else ("name", target.name)
+        groups.setdefault(key, []).append(target)
+    return list(groups.values())
+
+
+def build_target_command(fleet, target):
+    """Build the `nr-wg-mtu-finder` command for a single target."""
+    command = [
+        sys.executable,
+        "-u",
+        "-m",
+        "nr_wg_mtu_finder.main",
+        "--mode",
+        fleet.mode,
+        "--mtu-min",
+        f"{fleet.mtu_min}",
+        "--mtu-max",
+        f"{fleet.mtu_max}",
+        "--mtu-step",
+        f"{fleet.mtu_step}",
+        "--server-ip",
+        target.server_ip,
+        "--server-port",
+        f"{target.server_port}",
+        "--iperf3-port",
+        f"{target.iperf3_port}",
+        "--builtin-port",
+        f"{target.builtin_port}",
+        "--interface",
+        target.interface,
+        "--conf-file",
+        os.path.abspath(target.conf_file),
+    ]
+    for option, value in fleet.options.items():
+        command.extend([f"--{option}", f"{value}"])
+    return command
+
+
+def run_target(fleet, target):
+    """Run the sweep for a single target and wait for it to finish.
+
+    Each target runs in its own process inside its own directory. The log file (csv),
+    the heatmap file (png) and the console output of the target end up in
+    `<output_dir>/<target name>/`.
+    """
+    target_dir = os.path.abspath(os.path.join(fleet.output_dir, target.name))
+    os.makedirs(target_dir, exist_ok=True)
+    output_filepath = os.path.join(target_dir, "output.log")
+
+    msg = f"Starting target: {target.name}"
+    print(f"{msg:<50s}: Output in {output_filepath}")
+    with open(output_filepath, "a") as f:
+        process = subprocess.Popen(
+            build_target_command(fleet=fleet, target=target),
+            cwd=target_dir,
+            stdout=f,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+        )
+        returncode = process.wait()
+
+    msg = f"Finished target: {target.name}"
+    status = "SUCCESS" if returncode == 0 else f"FAILED with code {returncode}"
+    print(f"{msg:<50s}: {status}")
+    return returncode
+
+
+def run_target_group(fleet, targets):
+    """Run a group of targets one after another."""
+    return {target.name: run_target(fleet=fleet, target=target) for target in targets}
+
+
+def run_fleet(fleet):
+    """Run the sweeps for all targets of the fleet concurrently.
+
+    At most `max_parallel` groups of targets are run at the same time.
+
+    Returns:
+        A dict of target name to the returncode of its `nr-wg-mtu-finder` process.
+    """
+    groups = group_targets(fleet.targets)
+    returncodes = {}
+    with ThreadPoolExecutor(max_workers=fleet.max_parallel) as executor:
+        futures = [
+            executor.submit(run_target_group, fleet=fleet, targets=targets)
+            for targets in groups
+        ]
+        for future in as_completed(futures):
+            returncodes.update(future.result())
+
+    print("-" * 80)
+    for target in fleet.targets:
+        returncode = returncodes[target.name]
+        status = "SUCCESS" if returncode == 0 else f"FAILED with code {returncode}"
+        msg = f"Target: {target.name}"
+        print(f"{msg:<50s}: {status}")
+
+    return returncodes
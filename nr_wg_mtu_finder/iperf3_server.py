@@ -0,0 +1,164 @@
+import collections
+import os
+import signal
+import socket
+import subprocess
+import threading
+import time
+
+from nr_wg_mtu_finder.errors import ReturncodeError
+
+# The state that a busy iperf3 server sends to a new client before closing on it.
+ACCESS_DENIED = b"\xff"
+
+# Seconds to wait for a busy iperf3 server to send ACCESS_DENIED.
+PROBE_TIMEOUT = 1
+
+
+class Iperf3Server(object):
+    def __init__(self, port=5201, timeout=10):
+        """Keep a single `iperf3 -s` process running for the whole sweep.
+
+        `iperf3 -s` listens on all addresses, so spinning the WG interface down and up
+        with a new MTU does not require a restart. The server is only (re)started when
+        it is not running or not healthy, e.g. on the first MTU, after it crashed or
+        when it is stuck as busy with a client that was killed.
+
+        Args:
+            port: The port for the iperf3 server.
+            timeout: Seconds to wait for the iperf3 server to be listening, or to exit
+                when it is stopped.
+        """
+        self.port = port
+        self.timeout = timeout
+
+        self.process = None
+        self.reader_thread = None
+        # The last lines of output, for when the iperf3 server fails.
+        self.output = collections.deque(maxlen=50)
+
+    def is_running(self):
+        return (self.process is not None) and (self.process.poll() is None)
+
+    def read_output(self):
+        """Drain the output of the iperf3 server until it exits.
+
+        Draining keeps the iperf3 server from blocking once the pipe buffer is full.
+        """
+        for line in self.process.stdout:
+            self.output.append(line.rstrip())
+
+    def print_output(self):
+        """Print the last lines of output of the iperf3 server."""
+        print(f"*" * 80)
+        print(f"OUTPUT:\n-------")
+        print("\n".join(self.output))
+        print(f"*" * 80)
+
+    def probe(self):
+        """Probe the control port of the iperf3 server.
+
+        A busy iperf3 server answers a new connection with ACCESS_DENIED right away,
+        while an idle iperf3 server waits for the cookie of the client. Closing the
+        probe without a cookie makes an idle iperf3 server log an error and go back to
+        listening.
+
+        Returns:
+            One of 'idle', 'busy' or 'unreachable'.
+        """
+        try:
+            with socket.create_connection(
+                ("localhost", self.port), timeout=PROBE_TIMEOUT
+            ) as sock:
+                try:
+                    return "busy" if sock.recv(1) == ACCESS_DENIED else "idle"
+                except socket.timeout:
+                    return "idle"
+        except OSError:
+            return "unreachable"
+
+    def start(self):
+        """Start the iperf3 server and wait until it is listening.
+
+        Whether the iperf3 server is listening is probed on its port. Its output
+        cannot be used because iperf3 buffers it, and `--forceflush` is not supported
+        by older iperf3 versions e.g. 3.1.
+
+        Raises:
+            - ReturncodeError if the iperf3 server exits or is not listening within
+              `timeout` seconds.
+        """
+        msg = f"Running iperf3 server"
+        print(f"{msg:<50s}", end=": ")
+        self.output.clear()
+        self.process = subprocess.Popen(
+            ["iperf3", "-s", "-p", f"{self.port}"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            start_new_session=True,
+        )
+        self.reader_thread = threading.Thread(target=self.read_output, daemon=True)
+        self.reader_thread.start()
+
+        deadline = time.monotonic() + self.timeout
+        while self.is_running() and time.monotonic() < deadline:
+            if self.probe() != "unreachable":
+                print(f"SUCCESS, PID: {self.process.pid}")
+                return
+            time.sleep(0.2)
+
+        if self.is_running():
+            print(f"FAILED, not listening after {self.timeout}s, STATUS: timeout")
+            status = "timeout"
+        else:
+            print(f"FAILED with code {self.process.returncode}, STATUS: error")
+            status = "error"
+        self.stop()
+        self.print_output()
+        raise ReturncodeError(status=status)
+
+    def stop(self):
+        """Stop the iperf3 server, reap it and wait for its output to be drained."""
+        if self.process is None:
+            return
+
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+                self.process.wait()
+
+        self.reader_thread.join()
+        self.process.stdout.close()
+        self.process = None
+        self.reader_thread = None
+
+    def ensure_running(self):
+        """Start the iperf3 server unless it is already running and healthy.
+
+        Must only be called while no test is running, since a running test makes the
+        iperf3 server busy. An iperf3 server that is busy anyway, e.g. because a client
+        was killed while the WG interface was down, or that is not listening, is
+        stopped and started again. An iperf3 server that has exited is reaped before
+        it is started again.
+        """
+        if self.is_running():
+            msg = f"Checking iperf3 server"
+            status = self.probe()
+            if status == "idle":
+                print(f"{msg:<50s}: SUCCESS, still running, PID: {self.process.pid}")
+                return
+
+            print(f"{msg:<50s}: FAILED, STATUS: {status}, restarting")
+            self.stop()
+            self.print_output()
+        elif self.process is not None:
+            msg = f"Reaping exited iperf3 server"
+            print(f"{msg:<50s}: EXITED with code {self.process.returncode}")
+            self.stop()
+            self.print_output()
+
+        self.start()
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+# Bandwidth columns of the log file (csv) and their titles in the plots.
+METRICS = {
+    "upload_rcv_mbps": "Upload Rcv Bandwidth (Mbps)",
+    "upload_send_mbps": "Upload Send Bandwidth (Mbps)",
+    "download_rcv_mbps": "Download Rcv Bandwidth (Mbps)",
+    "download_send_mbps": "Download Send Bandwidth (Mbps)",
+}
+
+INDEX = ["server_mtu", "peer_mtu"]
+
+
+def read_log(log_filepath):
+    """Read a log file (csv) into a frame indexed by (server_mtu, peer_mtu).
+
+    Only the MTU and bandwidth columns are read. The bandwidth of failed tests, which
+    is logged as -1 or with a status other than 'ok', is set to NaN so that failed
+    tests do not count as measurements. If a pair was logged more than once, then the
+    last measurement wins.
+
+    Log files created by older versions without a `status` column are supported. These
+    versions logged the bandwidth of failed tests as -0.000, which is caught by its
+    sign bit, while a measured bandwidth that rounds to 0.000 is kept.
+    """
+    columns = pd.read_csv(log_filepath, nrows=0).columns
+    usecols = INDEX + list(METRICS) + (["status"] if "status" in columns else [])
+
+    df = pd.read_csv(
+        log_filepath,
+        usecols=usecols,
+        dtype={
+            **{column: np.int32 for column in INDEX},
+            **{m: np.float32 for m in METRICS},
+        },
+    )
+
+    failed = np.signbit(df[list(METRICS)]).any(axis=1)
+    if "status" in df.columns:
+        failed |= df.pop("status").ne("ok")
+    df.loc[failed, list(METRICS)] = np.nan
+
+    return df.drop_duplicates(subset=INDEX, keep="last").set_index(INDEX).sort_index()
@@ -4,9 +4,7 @@ import sys
 import time
 from distutils.util import strtobool
 
-from pydantic import BaseModel, StrictInt, StrictStr, root_validator
-from typing_extensions import Literal
-
+from .models import MTUFinderConfig
 from .mtu_finder import MTUFinder
 
 
@@ -24,42 +22,7 @@ def signal_handler(sig, frame):
 signal.signal(signal.SIGINT, signal_handler)
 
 
-class ArgsModel(BaseModel):
-    mode: Literal["server", "peer"]
-    mtu_min: int
-    mtu_max: int
-    mtu_step: int
-
-    server_ip: StrictStr
-    server_port: int = 5000
-
-    peer_skip_errors: bool = True
-
-    interface: StrictStr = "wg0"
-    conf_file: StrictStr = "/etc/wireguard/wg0.conf"
-
-    @root_validator(pre=False)
-    def validate(cls, values):
-        """Generic validations."""
-        mtu_min, mtu_max, mtu_step = (
-            values.get("mtu_min", None),
-            values.get("mtu_max", None),
-            values.get("mtu_step", None),
-        )
-
-        if not (1280 <= mtu_min <= 1500):
-            raise ValueError(f"mtu_min: {mtu_min} must be in range [1280, 1500].")
-
-        if not (1280 <= mtu_max <= 1500):
-            raise ValueError(f"mtu_max: {mtu_max} must be in range [1280, 1500].")
-
-        if not (mtu_min <= mtu_max):
-            raise ValueError(
-                f"mtu_min: {mtu_min} must be less than or equal to mtu_max: {mtu_max}"
-            )
-
-        return values
-
+class ArgsModel(MTUFinderConfig):
     class Config:
         orm_mode = True
 
@@ -106,6 +69,29 @@ def setup_args():
         required=False,
         default=5000,
     )
+    parser.add_argument(
+        "--iperf3-port",
+        help="The port for the iperf3 server. Default: 5201",
+        required=False,
+        default=5201,
+    )
+    parser.add_argument(
+        "--engine",
+        help=(
+            "The engine for the bandwidth tests. Either 'iperf3' or 'builtin'. The "
+            "'builtin' engine is a python throughput tester whose server stays "
+            "resident for the whole sweep, so no process is spawned per test. Must be "
+            "the same on the WG server and WG peer. Default: 'iperf3'"
+        ),
+        required=False,
+        default="iperf3",
+    )
+    parser.add_argument(
+        "--builtin-port",
+        help="The port for the built-in throughput server. Default: 5202",
+        required=False,
+        default=5202,
+    )
     parser.add_argument(
         "--interface",
         help="The WG interface name. Default: 'wg0'",
@@ -129,6 +115,62 @@ def setup_args():
         default=True,
         type=strtobool,
     )
+    parser.add_argument(
+        "--peer-retries",
+        help=(
+            "How many times to retry the tests of a Peer MTU when a transient error "
+            "occurs in 'peer' mode i.e. a timeout, an unreachable server or a busy "
+            "iperf3 server. Default: 2"
+        ),
+        required=False,
+        default=2,
+    )
+    parser.add_argument(
+        "--peer-retry-backoff",
+        help=(
+            "Seconds to wait before the first retry. The wait is doubled for every "
+            "following retry. Default: 2.0"
+        ),
+        required=False,
+        default=2.0,
+    )
+    parser.add_argument(
+        "--wg-timeout",
+        help=(
+            "Timeout in seconds for `wg-quick` and `sed` commands. The command is "
+            "killed when the timeout expires. Default: 30.0"
+        ),
+        required=False,
+        default=30.0,
+    )
+    parser.add_argument(
+        "--ping-timeout",
+        help=(
+            "Timeout in seconds for `ping` commands. The command is killed when the "
+            "timeout expires. Default: 15.0"
+        ),
+        required=False,
+        default=15.0,
+    )
+    parser.add_argument(
+        "--iperf3-timeout",
+        help=(
+            "Timeout in seconds for each `iperf3` upload or download test. The test "
+            "is killed when the timeout expires. Default: 30.0"
+        ),
+        required=False,
+        default=30.0,
+    )
+    parser.add_argument(
+        "--sync-timeout",
+        help=(
+            "Timeout in seconds for the peer to reach the flask server of the WG "
+            "server, e.g. while the server spins its interface down and up. The peer "
+            "gives up when the timeout expires. Default: 300.0"
+        ),
+        required=False,
+        default=300.0,
+    )
     args = parser.parse_args()
     return args
 
@@ -137,4 +179,8 @@ def run():
     args = setup_args()
     args = ArgsModel.from_orm(args)
 
-    MTUFinder(**args.dict())
+    MTUFinder(config=args).run()
+
+
+if __name__ == "__main__":
+    run()
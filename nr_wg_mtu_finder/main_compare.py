@@ -0,0 +1,111 @@
+import argparse
+import os
+from typing import List
+
+from pydantic import BaseModel, StrictStr, validator
+
+from nr_wg_mtu_finder.compare import (
+    align_logs,
+    compare_logs,
+    create_comparison_heatmap,
+    print_comparison_summary,
+)
+
+
+class ArgsModel(BaseModel):
+    log_filepaths: List[StrictStr]
+    output_dir: StrictStr = "."
+    rel_threshold: float = 0.1
+    abs_threshold: float = 10.0
+
+    @validator("log_filepaths")
+    def validate_log_filepaths(cls, log_filepaths):
+        """At least a baseline and one other log file are needed."""
+        if len(log_filepaths) < 2:
+            raise ValueError("log_filepaths: At least two log files are required.")
+        return log_filepaths
+
+    class Config:
+        orm_mode = True
+
+
+def setup_args():
+    """Setup args."""
+    parser = argparse.ArgumentParser(
+        description=(
+            "nr-wg-mtu-finder-compare - "
+            "Compare two or more log files (csv) that were created by the "
+            "`nr-wg-mtu-finder` script. The first log file is the baseline. For every "
+            "other log file a heatmap file (png) with the delta and ratio to the "
+            "baseline is created, along with a summary file (csv) of all pairs that "
+            "changed significantly."
+        )
+    )
+    parser.add_argument(
+        "--log-filepaths",
+        help=(
+            "Absolute paths to the log files (csv) that were created by the "
+            "`nr-wg-mtu-finder` script. The first log file is the baseline."
+        ),
+        nargs="+",
+        required=True,
+    )
+    parser.add_argument(
+        "--output-dir",
+        help=(
+            "Directory in which the heatmap files (png) and the summary file (csv) "
+            "are created. Default: '.'"
+        ),
+        required=False,
+        default=".",
+    )
+    parser.add_argument(
+        "--rel-threshold",
+        help=(
+            "Minimum change relative to the baseline for a pair to count as "
+            "significantly changed. Default: 0.1"
+        ),
+        required=False,
+        default=0.1,
+    )
+    parser.add_argument(
+        "--abs-threshold",
+        help=(
+            "Minimum change in Mbps for a pair to count as significantly changed. "
+            "Default: 10.0"
+        ),
+        required=False,
+        default=10.0,
+    )
+    args = parser.parse_args()
+    return args
+
+
+def run():
+    args = setup_args()
+    args = ArgsModel.from_orm(args)
+
+    aligned, failed = align_logs(log_filepaths=args.log_filepaths)
+    deltas, ratios, summary = compare_logs(
+        aligned=aligned,
+        failed=failed,
+        rel_threshold=args.rel_threshold,
+        abs_threshold=args.abs_threshold,
+    )
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    runs = list(aligned.columns.unique(level="run"))
+    for run_label in runs[1:]:
+        create_comparison_heatmap(
+            deltas=deltas,
+            ratios=ratios,
+            run=run_label,
+            heatmap_filepath=os.path.join(
+                args.output_dir, f"wg_mtu_finder_compare_{run_label}.png"
+            ),
+        )
+
+    summary_filepath = os.path.join(args.output_dir, "wg_mtu_finder_compare.csv")
+    summary.to_csv(summary_filepath, index=False, float_format="%0.3f")
+    print_comparison_summary(aligned=aligned, deltas=deltas, summary=summary)
+    print(f"Check significantly changed pairs: {summary_filepath}")
@@ -0,0 +1,58 @@
+import argparse
+import signal
+import sys
+import time
+
+from pydantic import BaseModel, StrictStr
+
+from nr_wg_mtu_finder.fleet import load_fleet_config, run_fleet
+
+
+def signal_handler(sig, frame):
+    """Handle ctrl+c interrupt.
+
+    The ctrl+c interrupt is also received by all `nr-wg-mtu-finder` processes of the
+    fleet since they share the same process group, so they shut down on their own.
+    """
+    print("************Received CTRL-C. Will exit in 1 second************")
+    time.sleep(1)
+    sys.exit(0)
+
+
+signal.signal(signal.SIGINT, signal_handler)
+
+
+class ArgsModel(BaseModel):
+    config_filepath: StrictStr
+
+    class Config:
+        orm_mode = True
+
+
+def setup_args():
+    """Setup args."""
+    parser = argparse.ArgumentParser(
+        description=(
+            "nr-wg-mtu-finder-fleet - "
+            "Run `nr-wg-mtu-finder` for multiple WG interfaces or WG servers "
+            "concurrently. The targets are read from a fleet config file (json)."
+        )
+    )
+    parser.add_argument(
+        "--config-filepath",
+        help="Absolute path to the fleet config file (json).",
+        required=True,
+    )
+    args = parser.parse_args()
+    return args
+
+
+def run():
+    args = setup_args()
+    args = ArgsModel.from_orm(args)
+
+    fleet = load_fleet_config(config_filepath=args.config_filepath)
+    returncodes = run_fleet(fleet=fleet)
+
+    if any(returncode != 0 for returncode in returncodes.values()):
+        sys.exit(1)
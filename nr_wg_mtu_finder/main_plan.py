@@ -0,0 +1,151 @@
+import argparse
+from typing import Optional
+
+from pydantic import BaseModel, StrictStr, root_validator
+
+from nr_wg_mtu_finder.planner import (
+    DEFAULT_PAIR_SECONDS,
+    DEFAULT_SERVER_RESTART_SECONDS,
+    estimate_costs_from_log,
+    format_duration,
+    plan_sweep,
+    validate_mtu_range,
+)
+
+
+class ArgsModel(BaseModel):
+    mtu_min: int
+    mtu_max: int
+    mtu_step: int
+
+    log_filepath: Optional[StrictStr] = None
+    pair_seconds: Optional[float] = None
+    server_restart_seconds: Optional[float] = None
+
+    @root_validator(pre=False)
+    def validate(cls, values):
+        """Generic validations."""
+        validate_mtu_range(
+            mtu_min=values.get("mtu_min", None), mtu_max=values.get("mtu_max", None)
+        )
+
+        mtu_step = values.get("mtu_step", None)
+        if mtu_step is not None and mtu_step < 1:
+            raise ValueError(f"mtu_step: {mtu_step} must be at least 1.")
+
+        pair_seconds = values.get("pair_seconds", None)
+        if pair_seconds is not None and pair_seconds <= 0:
+            raise ValueError(f"pair_seconds: {pair_seconds} must be positive.")
+
+        # A server restart cost of 0.0 is valid, e.g. when measured from a log file.
+        server_restart_seconds = values.get("server_restart_seconds", None)
+        if server_restart_seconds is not None and server_restart_seconds < 0:
+            raise ValueError(
+                f"server_restart_seconds: {server_restart_seconds} must not be "
+                f"negative."
+            )
+
+        return values
+
+    class Config:
+        orm_mode = True
+
+
+def setup_args():
+    """Setup args."""
+    parser = argparse.ArgumentParser(
+        description=(
+            "nr-wg-mtu-finder-plan - "
+            "Compute the number of MTU pairs and server restarts of a sweep and "
+            "estimate how long it will take before running it."
+        )
+    )
+    parser.add_argument(
+        "--mtu-min",
+        help="Min MTU. Must be in the range [1280, 1500].",
+        required=True,
+    )
+    parser.add_argument(
+        "--mtu-max",
+        help="Max MTU. Must be in the range [1280, 1500].",
+        required=True,
+    )
+    parser.add_argument(
+        "--mtu-step",
+        help="By how much to increment the MTU between loops.",
+        required=True,
+    )
+    parser.add_argument(
+        "--log-filepath",
+        help=(
+            "Absolute path to the log file (csv) of a previous sweep between the same "
+            "WG server and WG peer. If given, the costs are measured from the log file "
+            "instead of using the defaults."
+        ),
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--pair-seconds",
+        help=(
+            "Seconds it takes to test one pair of server MTU and peer MTU. Overrides "
+            f"the measured cost. Default: {DEFAULT_PAIR_SECONDS}"
+        ),
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--server-restart-seconds",
+        help=(
+            "Seconds it takes for the server to switch to the next server MTU. "
+            f"Overrides the measured cost. Default: {DEFAULT_SERVER_RESTART_SECONDS}"
+        ),
+        required=False,
+        default=None,
+    )
+    args = parser.parse_args()
+    return args
+
+
+def first_not_none(*values):
+    """Get the first value that is not None.
+
+    Unlike `or`, a measured cost of 0.0 is kept.
+    """
+    return next(value for value in values if value is not None)
+
+
+def run():
+    args = setup_args()
+    args = ArgsModel.from_orm(args)
+
+    pair_seconds, server_restart_seconds = None, None
+    if args.log_filepath:
+        pair_seconds, server_restart_seconds = estimate_costs_from_log(
+            log_filepath=args.log_filepath
+        )
+
+    plan = plan_sweep(
+        mtu_min=args.mtu_min,
+        mtu_max=args.mtu_max,
+        mtu_step=args.mtu_step,
+        pair_seconds=first_not_none(
+            args.pair_seconds, pair_seconds, DEFAULT_PAIR_SECONDS
+        ),
+        server_restart_seconds=first_not_none(
+            args.server_restart_seconds,
+            server_restart_seconds,
+            DEFAULT_SERVER_RESTART_SECONDS,
+        ),
+    )
+
+    for msg, value in [
+        ("Server MTUs", plan.n_server_mtus),
+        ("Peer MTUs", plan.n_peer_mtus),
+        ("Pairs", plan.n_pairs),
+        ("Server restarts", plan.n_server_restarts),
+        ("Seconds per pair", f"{plan.pair_seconds:0.1f}"),
+        ("Seconds per server restart", f"{plan.server_restart_seconds:0.1f}"),
+        ("Estimated duration", format_duration(plan.estimated_seconds)),
+    ]:
+        print(f"{msg:<50s}: {value}")
@@ -0,0 +1,107 @@
+import argparse
+import json
+from typing import List, Optional
+
+from pydantic import BaseModel, StrictStr, root_validator
+
+from nr_wg_mtu_finder.analysis import recommend_mtu
+
+
+class ArgsModel(BaseModel):
+    log_filepaths: List[StrictStr]
+    output_filepath: Optional[StrictStr] = None
+    neighbourhood: int = 3
+    dead_zone_fraction: float = 0.1
+
+    @root_validator(pre=False)
+    def validate(cls, values):
+        """Generic validations."""
+        neighbourhood, dead_zone_fraction = (
+            values.get("neighbourhood", None),
+            values.get("dead_zone_fraction", None),
+        )
+
+        if neighbourhood is not None and (neighbourhood < 1 or neighbourhood % 2 == 0):
+            raise ValueError(
+                f"neighbourhood: {neighbourhood} must be an odd number like 1, 3 or 5."
+            )
+
+        if dead_zone_fraction is not None and not (0 <= dead_zone_fraction <= 1):
+            raise ValueError(
+                f"dead_zone_fraction: {dead_zone_fraction} must be in range [0, 1]."
+            )
+
+        return values
+
+    class Config:
+        orm_mode = True
+
+
+def setup_args():
+    """Setup args."""
+    parser = argparse.ArgumentParser(
+        description=(
+            "nr-wg-mtu-finder-recommend - "
+            "Recommend the best and the most robust MTU pairs from one or more log "
+            "files (csv) that were created by the `nr-wg-mtu-finder` script. The "
+            "recommendation is written as json."
+        )
+    )
+    parser.add_argument(
+        "--log-filepaths",
+        help=(
+            "Absolute paths to the log files (csv) that were created by the "
+            "`nr-wg-mtu-finder` script. The median bandwidth of every pair across all "
+            "log files is used."
+        ),
+        nargs="+",
+        required=True,
+    )
+    parser.add_argument(
+        "--output-filepath",
+        help=(
+            "Absolute path to the recommendation file (json) which will be created. "
+            "If not given, the recommendation is printed."
+        ),
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--neighbourhood",
+        help=(
+            "Size of the neighbourhood of server MTUs x peer MTUs whose worst "
+            "bandwidth must be as high as possible for a pair to be robust. "
+            "Default: 3"
+        ),
+        required=False,
+        default=3,
+    )
+    parser.add_argument(
+        "--dead-zone-fraction",
+        help=(
+            "Pairs whose bandwidth is below this fraction of the best bandwidth are "
+            "flagged as dead zones. Default: 0.1"
+        ),
+        required=False,
+        default=0.1,
+    )
+    args = parser.parse_args()
+    return args
+
+
+def run():
+    args = setup_args()
+    args = ArgsModel.from_orm(args)
+
+    result = recommend_mtu(
+        log_filepaths=args.log_filepaths,
+        neighbourhood=args.neighbourhood,
+        dead_zone_fraction=args.dead_zone_fraction,
+    )
+
+    if args.output_filepath:
+        with open(args.output_filepath, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Check recommendation: {args.output_filepath}")
+    else:
+        print(json.dumps(result, indent=2))
@@ -0,0 +1,232 @@
+import argparse
+import signal
+import statistics
+import sys
+import time
+from typing import Optional
+
+from pydantic import BaseModel, StrictStr, root_validator
+from typing_extensions import Literal
+
+from nr_wg_mtu_finder.errors import ReturncodeError
+from nr_wg_mtu_finder.models import MTUFinderConfig
+from nr_wg_mtu_finder.mtu_finder import MTUFinder
+from nr_wg_mtu_finder.throughput import ThroughputClient, ThroughputServer
+
+
+def signal_handler(sig, frame):
+    """Handle ctrl+c interrupt."""
+    print("************Received CTRL-C. Will exit in 1 second************")
+    time.sleep(1)
+    sys.exit(0)
+
+
+signal.signal(signal.SIGINT, signal_handler)
+
+
+class ArgsModel(BaseModel):
+    mode: Literal["server", "benchmark", "loopback"]
+    server_ip: Optional[StrictStr] = None
+    builtin_port: int = 5202
+    iperf3_port: int = 5201
+    rounds: int = 3
+
+    @root_validator(pre=False)
+    def validate(cls, values):
+        """Generic validations."""
+        mode, server_ip = values.get("mode", None), values.get("server_ip", None)
+
+        if mode in ["server", "benchmark"] and server_ip is None:
+            raise ValueError(f"server_ip: Must be given in '{mode}' mode.")
+
+        return values
+
+    class Config:
+        orm_mode = True
+
+
+def setup_args():
+    """Setup args."""
+    parser = argparse.ArgumentParser(
+        description=(
+            "nr-wg-mtu-finder-throughput - "
+            "Run the built-in throughput server, or benchmark the built-in throughput "
+            "tester against iperf3 from the peer side. For a benchmark, both the "
+            "built-in throughput server and `iperf3 -s` must be running on the server "
+            "side. A loopback check of the built-in throughput tester needs neither."
+        )
+    )
+    parser.add_argument(
+        "--mode",
+        help=(
+            "Mode should be 'server' to run the built-in throughput server. "
+            "Mode should be 'benchmark' to compare the built-in throughput tester "
+            "against iperf3. "
+            "Mode should be 'loopback' to check an upload, a download and an "
+            "unreachable server with the built-in throughput tester over loopback."
+        ),
+        required=True,
+    )
+    parser.add_argument(
+        "--server-ip",
+        help=(
+            "In 'server' mode, the IP address to listen on e.g. '0.0.0.0'. "
+            "In 'benchmark' mode, the IP address of the server. "
+            "Not used in 'loopback' mode."
+        ),
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--builtin-port",
+        help="The port for the built-in throughput server. Default: 5202",
+        required=False,
+        default=5202,
+    )
+    parser.add_argument(
+        "--iperf3-port",
+        help="The port for the iperf3 server. Default: 5201",
+        required=False,
+        default=5201,
+    )
+    parser.add_argument(
+        "--rounds",
+        help="How many times to run every test in 'benchmark' mode. Default: 3",
+        required=False,
+        default=3,
+    )
+    args = parser.parse_args()
+    return args
+
+
+def run_benchmark(server_ip, builtin_port, iperf3_port, rounds):
+    """Run the upload and download tests with both engines and compare the medians."""
+    finder = MTUFinder(
+        config=MTUFinderConfig(
+            mode="peer",
+            mtu_min=1280,
+            mtu_max=1280,
+            mtu_step=1,
+            server_ip=server_ip,
+            iperf3_port=iperf3_port,
+            builtin_port=builtin_port,
+        )
+    )
+
+    tests = {
+        ("iperf3", "upload"): finder.run_iperf3_upload_test,
+        ("iperf3", "download"): finder.run_iperf3_download_test,
+        ("builtin", "upload"): lambda: finder.run_builtin_test("upload"),
+        ("builtin", "download"): lambda: finder.run_builtin_test("download"),
+    }
+    results = {key: [] for key in tests}
+    try:
+        for _ in range(rounds):
+            for key, test in tests.items():
+                results[key].append(test())
+                time.sleep(1)
+    finally:
+        if finder.throughput_client:
+            finder.throughput_client.close()
+
+    print("-" * 80)
+    for direction in ["upload", "download"]:
+        for side, i in [("rcv", 0), ("send", 1)]:
+            iperf3_mbps = statistics.median(
+                bps[i] / 1000000 for bps in results[("iperf3", direction)]
+            )
+            builtin_mbps = statistics.median(
+                bps[i] / 1000000 for bps in results[("builtin", direction)]
+            )
+            difference = (
+                f"{100 * (builtin_mbps / iperf3_mbps - 1):+0.1f}%"
+                if iperf3_mbps > 0
+                else "n/a"
+            )
+            msg = f"Median {direction} {side} (Mbps)"
+            print(
+                f"{msg:<50s}: iperf3 {iperf3_mbps:0.3f}, built-in {builtin_mbps:0.3f}, "
+                f"difference {difference}"
+            )
+
+
+def run_loopback_check(duration=1):
+    """Check the built-in throughput tester over loopback.
+
+    An upload and a download against a server on 127.0.0.1 must both measure some
+    bandwidth, and a stopped server must be reported as 'unreachable'.
+
+    Returns:
+        True if all checks passed.
+    """
+    server = ThroughputServer(host="127.0.0.1", port=0)
+    server.start()
+    finder = MTUFinder(
+        config=MTUFinderConfig(
+            mode="peer",
+            mtu_min=1280,
+            mtu_max=1280,
+            mtu_step=1,
+            server_ip="127.0.0.1",
+            engine="builtin",
+            builtin_port=server.port,
+        )
+    )
+    finder.throughput_client = ThroughputClient(
+        host="127.0.0.1", port=server.port, duration=duration
+    )
+
+    passed = True
+    try:
+        for direction in ["upload", "download"]:
+            try:
+                rcv_bps, send_bps = finder.run_builtin_test(direction)
+            except ReturncodeError:
+                rcv_bps, send_bps = 0.0, 0.0
+            ok = rcv_bps > 0 and send_bps > 0
+            passed = passed and ok
+            msg = f"Loopback {direction} (Mbps)"
+            print(
+                f"{msg:<50s}: rcv {rcv_bps / 1000000:0.3f}, "
+                f"send {send_bps / 1000000:0.3f}, {'SUCCESS' if ok else 'FAILED'}"
+            )
+    finally:
+        finder.throughput_client.close()
+        finder.throughput_client = None
+        server.stop()
+
+    try:
+        finder.run_builtin_test("upload")
+        status = "ok"
+    except ReturncodeError as e:
+        status = e.status
+    finally:
+        finder.throughput_client.close()
+    ok = status == "unreachable"
+    passed = passed and ok
+    msg = f"Loopback stopped server"
+    print(f"{msg:<50s}: STATUS: {status}, {'SUCCESS' if ok else 'FAILED'}")
+
+    return passed
+
+
+def run():
+    args = setup_args()
+    args = ArgsModel.from_orm(args)
+
+    if args.mode == "server":
+        server = ThroughputServer(host=args.server_ip, port=args.builtin_port)
+        server.start()
+        while True:
+            time.sleep(1)
+    elif args.mode == "benchmark":
+        run_benchmark(
+            server_ip=args.server_ip,
+            builtin_port=args.builtin_port,
+            iperf3_port=args.iperf3_port,
+            rounds=args.rounds,
+        )
+    elif args.mode == "loopback":
+        sys.exit(0 if run_loopback_check() else 1)
+    else:
+        raise NotImplementedError()
@@ -0,0 +1,80 @@
+from typing import Optional
+
+from pydantic import BaseModel, StrictStr, root_validator
+from typing_extensions import Literal
+
+from nr_wg_mtu_finder.planner import validate_mtu_range
+
+
+class MTUFinderConfig(BaseModel):
+    mode: Literal["server", "peer"]
+    mtu_min: int
+    mtu_max: int
+    mtu_step: int
+
+    server_ip: StrictStr
+    server_port: int = 5000
+    iperf3_port: int = 5201
+
+    # Use either iperf3 or the built-in throughput tester for the bandwidth tests.
+    engine: Literal["iperf3", "builtin"] = "iperf3"
+    builtin_port: int = 5202
+
+    peer_skip_errors: bool = True
+    peer_retries: int = 2
+    peer_retry_backoff: float = 2.0
+
+    wg_timeout: float = 30.0
+    ping_timeout: float = 15.0
+    iperf3_timeout: float = 30.0
+    sync_timeout: float = 300.0
+
+    interface: StrictStr = "wg0"
+    conf_file: StrictStr = "/etc/wireguard/wg0.conf"
+
+    # Defaults to `wg_mtu_finder_<mode>_<datetime>.csv/png` in the working directory.
+    log_filepath: Optional[StrictStr] = None
+    heatmap_filepath: Optional[StrictStr] = None
+
+    @root_validator(pre=False)
+    def validate_config(cls, values):
+        """Generic validations."""
+        mtu_min, mtu_max, mtu_step = (
+            values.get("mtu_min", None),
+            values.get("mtu_max", None),
+            values.get("mtu_step", None),
+        )
+
+        validate_mtu_range(mtu_min=mtu_min, mtu_max=mtu_max)
+
+        if mtu_step is not None and mtu_step < 1:
+            raise ValueError(f"mtu_step: {mtu_step} must be at least 1.")
+
+        peer_retries = values.get("peer_retries", None)
+        if peer_retries is not None and peer_retries < 0:
+            raise ValueError(f"peer_retries: {peer_retries} must not be negative.")
+
+        for timeout in ["wg_timeout", "ping_timeout", "iperf3_timeout", "sync_timeout"]:
+            if values.get(timeout, None) is not None and values[timeout] <= 0:
+                raise ValueError(f"{timeout}: {values[timeout]} must be positive.")
+
+        return values
+
+
+class MTUResult(BaseModel):
+    """The bandwidth of a single pair of server MTU and peer MTU.
+
+    The bandwidths are None if the tests of the pair failed, in which case `status`
+    tells why i.e. 'timeout', 'unreachable', 'busy' or 'error'.
+    """
+
+    server_mtu: int
+    peer_mtu: int
+
+    upload_rcv_mbps: Optional[float]
+    upload_send_mbps: Optional[float]
+    download_rcv_mbps: Optional[float]
+    download_send_mbps: Optional[float]
+
+    status: StrictStr
+    timestamp: float
@@ -1,66 +1,114 @@
+import errno
 import json
+import os
+import queue
+import signal
+import socket
 import subprocess
-import sys
+import threading
 import time
 from datetime import datetime
 
 import requests
 
+from nr_wg_mtu_finder.errors import TRANSIENT_STATUSES, ReturncodeError
+from nr_wg_mtu_finder.iperf3_server import Iperf3Server
+from nr_wg_mtu_finder.models import MTUResult
+from nr_wg_mtu_finder.planner import SweepProgress, plan_sweep
 from nr_wg_mtu_finder.plot import create_heatmap_from_log
 
 # Set to either client or server
 from nr_wg_mtu_finder.sync_server import run_sync_server
+from nr_wg_mtu_finder.throughput import ThroughputClient, ThroughputServer
 
 
-class ReturncodeError(Exception):
-    pass
+class MTUFinder(object):
+    def __init__(self, config):
+        """Init.
 
+        Nothing is run until `run()` or `iter_results()` is called.
 
-class MTUFinder(object):
-    def __init__(
-        self,
-        mode,
-        server_ip,
-        server_port,
-        interface,
-        conf_file,
-        mtu_max,
-        mtu_min,
-        mtu_step,
-        peer_skip_errors,
-    ):
-        """Init."""
-        self.mode = mode
+        Args:
+            config: A `MTUFinderConfig`.
+        """
+        self.config = config
+        self.mode = config.mode
 
-        self.server_ip = server_ip
-        self.server_port = server_port
-        self.interface = interface
-        self.conf_file = conf_file
+        self.server_ip = config.server_ip
+        self.server_port = config.server_port
+        self.iperf3_port = config.iperf3_port
+        self.builtin_port = config.builtin_port
+        self.engine = config.engine
+        self.interface = config.interface
+        self.conf_file = config.conf_file
 
-        self.mtu_max = mtu_max
-        self.mtu_min = mtu_min
-        self.mtu_step = mtu_step
+        self.mtu_max = config.mtu_max
+        self.mtu_min = config.mtu_min
+        self.mtu_step = config.mtu_step
 
         self.peer_mtu = None
         self.server_mtu = None
         self.current_mtu = None
 
-        self.peer_skip_errors = peer_skip_errors
+        self.peer_skip_errors = config.peer_skip_errors
+        self.peer_retries = config.peer_retries
+        self.peer_retry_backoff = config.peer_retry_backoff
 
-        self.log_filepath = (
+        self.wg_timeout = config.wg_timeout
+        self.ping_timeout = config.ping_timeout
+        self.iperf3_timeout = config.iperf3_timeout
+        self.sync_timeout = config.sync_timeout
+
+        self.log_filepath = config.log_filepath or (
             f"wg_mtu_finder_{self.mode}_{datetime.now().strftime('%Y%m%dT%H%M%S')}.csv"
         )
-        self.heatmap_filepath = (
+        self.heatmap_filepath = config.heatmap_filepath or (
             f"wg_mtu_finder_{self.mode}_{datetime.now().strftime('%Y%m%dT%H%M%S')}.png"
         )
 
+        self.cancelled = threading.Event()
+        self.throughput_client = None
+
+    def run(self):
+        """Run all steps for the configured mode until the sweep is done or cancelled."""
         if self.mode == "server":
             self.run_server_mode()
         elif self.mode == "peer":
-            self.run_peer_mode()
+            for _ in self.iter_results():
+                pass
         else:
             raise NotImplementedError()
 
+    def cancel(self):
+        """Stop the sweep after the current step.
+
+        Can be called from another thread. Waiting for the sync server and waiting
+        before a retry are interrupted, and `run()` and `iter_results()` return
+        instead of starting the next MTU.
+        """
+        self.cancelled.set()
+
+    def iter_results(self):
+        """Run the peer mode and yield a `MTUResult` for every pair as it completes.
+
+        The sweep stops early if the generator is closed, e.g. by breaking out of the
+        loop that consumes it, or if `cancel()` is called.
+        """
+        if self.mode != "peer":
+            raise ValueError(
+                f"iter_results is only supported in 'peer' mode, not '{self.mode}'."
+            )
+        return self.__iter_peer_results()
+
+    def __iter_peer_results(self):
+        """Run the peer mode and close the built-in throughput client afterwards."""
+        try:
+            yield from self.run_peer_mode()
+        finally:
+            if self.throughput_client:
+                self.throughput_client.close()
+                self.throughput_client = None
+
     def create_log(self):
         """Create an empty CSV log file with the headers.
 
@@ -75,75 +123,160 @@ class MTUFinder(object):
                 f"upload_rcv_mbps,"
                 f"upload_send_mbps,"
                 f"download_rcv_mbps,"
-                f"download_send_mbps\n"
+                f"download_send_mbps,"
+                f"status,"
+                f"timestamp\n"
             )
         print("SUCCESS")
 
     @staticmethod
-    def handle_returncode(returncode, stdout, stderr):
+    def classify_error(stdout, stderr):
+        """Classify a failed command by looking at its output.
+
+        iperf3 reports errors in its json output (stdout) when run with the -J flag,
+        ping and wg-quick report them in stderr.
+        """
+        output = f"{stdout}\n{stderr}".lower()
+        if "busy" in output:
+            return "busy"
+        elif any(
+            error in output
+            for error in [
+                "unable to connect",
+                "connection refused",
+                "no route to host",
+                "network is unreachable",
+                "host unreachable",
+                "100% packet loss",
+            ]
+        ):
+            return "unreachable"
+        else:
+            return "error"
+
+    @staticmethod
+    def print_output(stdout, stderr):
+        """Print the output of a failed command."""
+        print(f"*" * 80)
+        print(f"STDOUT:\n-------")
+        print(stdout)
+        print(f"STDERR:\n-------")
+        print(stderr)
+        print(f"*" * 80)
+
+    def handle_returncode(self, returncode, stdout, stderr):
         """Handle status code."""
         if returncode == 0:
             print("SUCCESS")
         else:
-            print(f"FAILED with code {returncode}")
-            print(f"*" * 80)
-            print(f"STDOUT:\n-------")
-            print(stdout)
-            print(f"STDERR:\n-------")
-            print(stderr)
-            print(f"*" * 80)
-            raise ReturncodeError()
+            status = self.classify_error(stdout=stdout, stderr=stderr)
+            print(f"FAILED with code {returncode}, STATUS: {status}")
+            self.print_output(stdout=stdout, stderr=stderr)
+            raise ReturncodeError(status=status)
+
+    def run_command(self, command, timeout):
+        """Run a shell command and wait at most `timeout` seconds for it to finish.
+
+        The command is run in its own process group so that the command and all of
+        its children can be killed if the timeout expires.
+
+        Raises:
+            - ReturncodeError if the command fails or if the timeout expires.
+        """
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            start_new_session=True,
+        )
+
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            stdout, stderr = process.communicate()
+            print(f"FAILED with timeout after {timeout}s, STATUS: timeout")
+            self.print_output(stdout=stdout, stderr=stderr)
+            raise ReturncodeError(status="timeout")
+
+        self.handle_returncode(
+            returncode=process.returncode, stdout=stdout, stderr=stderr
+        )
+        return stdout
 
     def append_log_with_bandwidth_info(
-        self, up_rcv_bps, up_snd_bps, down_rcv_bps, down_snd_bps
+        self, up_rcv_bps, up_snd_bps, down_rcv_bps, down_snd_bps, status="ok"
     ):
-        """Append the bandwidth information to the log file."""
+        """Append the bandwidth information to the log file and return it.
+
+        The bandwidth of failed tests is logged as -1.
+        """
         if self.mode == "server":
             raise NotImplementedError()
 
         msg = f"Appending log for MTU: {self.current_mtu}"
         print(f"{msg:<50s}", end=": ")
 
+        mbps = [
+            (bps / 1000000 if status == "ok" else None)
+            for bps in [up_rcv_bps, up_snd_bps, down_rcv_bps, down_snd_bps]
+        ]
+        logged_mbps = ["-1" if m is None else f"{m:0.3f}" for m in mbps]
+        timestamp = time.time()
         with open(self.log_filepath, "a") as f:
             f.write(
                 f"{self.server_mtu},"
                 f"{self.peer_mtu},"
-                f"{up_rcv_bps / 1000000:0.3f},"
-                f"{up_snd_bps / 1000000:0.3f},"
-                f"{down_rcv_bps / 1000000:0.3f},"
-                f"{down_snd_bps / 1000000:0.3f}\n"
+                f"{logged_mbps[0]},"
+                f"{logged_mbps[1]},"
+                f"{logged_mbps[2]},"
+                f"{logged_mbps[3]},"
+                f"{status},"
+                f"{timestamp:0.3f}\n"
             )
 
         print("SUCCESS")
 
+        return MTUResult(
+            server_mtu=self.server_mtu,
+            peer_mtu=self.peer_mtu,
+            upload_rcv_mbps=mbps[0],
+            upload_send_mbps=mbps[1],
+            download_rcv_mbps=mbps[2],
+            download_send_mbps=mbps[3],
+            status=status,
+            timestamp=timestamp,
+        )
+
+    def interface_exists(self):
+        """Check whether the interface exists i.e. whether it is up."""
+        try:
+            socket.if_nametoindex(self.interface)
+            return True
+        except OSError:
+            return False
+
     def wg_quick_down(self):
-        """Spin down the interface using wg-quick."""
+        """Spin down the interface using wg-quick.
+
+        Skipped if the interface is already down, e.g. after a failed wg-quick up.
+        """
         msg = "WG Interface Down"
         print(f"{msg:<50s}", end=": ")
-        process = subprocess.Popen(
-            ["wg-quick", "down", f"{self.interface}"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-        )
-        stdout, stderr = process.communicate()
-        self.handle_returncode(
-            returncode=process.returncode, stdout=stdout, stderr=stderr
+        if not self.interface_exists():
+            print("SKIPPED, interface is already down")
+            return
+        self.run_command(
+            ["wg-quick", "down", f"{self.interface}"], timeout=self.wg_timeout
         )
 
     def wg_quick_up(self):
         """Spin up the interface using wg-quick."""
         msg = "WG Interface Up"
         print(f"{msg:<50s}", end=": ")
-        process = subprocess.Popen(
-            ["wg-quick", "up", f"{self.interface}"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-        )
-        stdout, stderr = process.communicate()
-        self.handle_returncode(
-            returncode=process.returncode, stdout=stdout, stderr=stderr
+        self.run_command(
+            ["wg-quick", "up", f"{self.interface}"], timeout=self.wg_timeout
         )
 
     def __validate_conf_file(self):
@@ -169,36 +302,31 @@ class MTUFinder(object):
 
         msg = f"Setting MTU to {self.current_mtu} in {self.conf_file}"
         print(f"{msg:<50s}", end=": ")
-        process = subprocess.Popen(
+        self.run_command(
             ["sed", "-i", f"s/MTU.*/MTU = {self.current_mtu}/", f"{self.conf_file}"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-        )
-
-        stdout, stderr = process.communicate()
-        self.handle_returncode(
-            returncode=process.returncode, stdout=stdout, stderr=stderr
+            timeout=self.wg_timeout,
         )
 
     def run_iperf3_upload_test(self):
         """Run iperf3 upload test."""
         msg = f"Running peer upload"
         print(f"{msg:<50s}", end=": ")
-        command = ["iperf3", "-c", f"{self.server_ip}", "-J", "-t", "5", "-i", "5"]
+        command = [
+            "iperf3",
+            "-c",
+            f"{self.server_ip}",
+            "-p",
+            f"{self.iperf3_port}",
+            "-J",
+            "-t",
+            "5",
+            "-i",
+            "5",
+        ]
         # print(f"command: {' '.join(command)}")
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-        )
 
         # Wait iperf3 test to be done.
-        stdout, stderr = process.communicate()
-        self.handle_returncode(
-            returncode=process.returncode, stdout=stdout, stderr=stderr
-        )
+        stdout = self.run_command(command, timeout=self.iperf3_timeout)
 
         # load iperf3 output json which results from the -J flag
         output = json.loads(stdout)
@@ -211,18 +339,22 @@ class MTUFinder(object):
         """Run iperf3 upload test."""
         msg = f"Running peer download"
         print(f"{msg:<50s}", end=": ")
-        process = subprocess.Popen(
-            ["iperf3", "-c", f"{self.server_ip}", "-J", "-t", "5", "-i", "5", "-R"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-        )
+        command = [
+            "iperf3",
+            "-c",
+            f"{self.server_ip}",
+            "-p",
+            f"{self.iperf3_port}",
+            "-J",
+            "-t",
+            "5",
+            "-i",
+            "5",
+            "-R",
+        ]
 
         # Wait iperf3 test to be done.
-        stdout, stderr = process.communicate()
-        self.handle_returncode(
-            returncode=process.returncode, stdout=stdout, stderr=stderr
-        )
+        stdout = self.run_command(command, timeout=self.iperf3_timeout)
 
         # load iperf3 output json which results from the -J flag
         output = json.loads(stdout)
@@ -231,58 +363,171 @@ class MTUFinder(object):
             output["end"]["streams"][0]["sender"]["bits_per_second"],
         )
 
-    def __peer_mode__wait_for_server_init(self):
-        """Get server mtu.
+    def run_builtin_test(self, direction):
+        """Run an upload or download test with the built-in throughput tester.
+
+        The client and its control connection are kept for the whole sweep.
+        """
+        msg = f"Running peer {direction} (built-in)"
+        print(f"{msg:<50s}", end=": ")
+        if self.throughput_client is None:
+            self.throughput_client = ThroughputClient(
+                host=self.server_ip,
+                port=self.builtin_port,
+                duration=5,
+                timeout=self.iperf3_timeout,
+            )
+
+        try:
+            if direction == "upload":
+                bps = self.throughput_client.run_upload_test()
+            else:
+                bps = self.throughput_client.run_download_test()
+        except socket.timeout as e:
+            print(f"FAILED with {e!r}, STATUS: timeout")
+            raise ReturncodeError(status="timeout")
+        except OSError as e:
+            status = (
+                "unreachable"
+                if e.errno
+                in [errno.ECONNREFUSED, errno.EHOSTUNREACH, errno.ENETUNREACH]
+                else "error"
+            )
+            print(f"FAILED with {e!r}, STATUS: {status}")
+            raise ReturncodeError(status=status)
+        except ValueError as e:
+            print(f"FAILED with {e!r}, STATUS: error")
+            raise ReturncodeError(status="error")
+
+        print("SUCCESS")
+        return bps
+
+    def run_upload_test(self):
+        """Run the upload test with the configured engine."""
+        if self.engine == "builtin":
+            return self.run_builtin_test("upload")
+        return self.run_iperf3_upload_test()
+
+    def run_download_test(self):
+        """Run the download test with the configured engine."""
+        if self.engine == "builtin":
+            return self.run_builtin_test("download")
+        return self.run_iperf3_download_test()
+
+    def __peer_mode__request_sync_server(self, route):
+        """Send a request to the flask server and get back the server status.
 
         Raises:
-            - requests.Timeout, requests.ConnectionError or KeyError if there is
-              something wrong with the Flask server running on the WG server.
+            - ReturncodeError with status 'unreachable' if the connection failed,
+              'timeout' if the flask server did not respond in time, in which case the
+              request may have been handled, or 'error' if the response is not valid.
         """
-        while True:
-            msg = f"Waiting for server init and status"
-            print(f"{msg:<50s}", end=": ")
-            try:
-                resp = requests.get(
-                    f"http://{self.server_ip}:{self.server_port}/server/status",
-                    verify=False,
-                    timeout=5,
-                )
+        try:
+            resp = requests.get(
+                f"http://{self.server_ip}:{self.server_port}{route}",
+                verify=False,
+                timeout=5,
+            )
+            resp.raise_for_status()
+            return resp.json()["server_mtu"], resp.json()["server_status"]
+        except requests.exceptions.ReadTimeout as e:
+            print(f"FAILED with {e.__class__.__name__}, STATUS: timeout")
+            raise ReturncodeError(status="timeout")
+        except requests.exceptions.ConnectionError as e:
+            print(f"FAILED with {e.__class__.__name__}, STATUS: unreachable")
+            raise ReturncodeError(status="unreachable")
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            print(f"FAILED with {e!r}, STATUS: error")
+            raise ReturncodeError(status="error")
+
+    def __peer_mode__sync_with_server(
+        self, route, wait_for_init, retry_statuses=TRANSIENT_STATUSES
+    ):
+        """Request the flask server until it responds, or until `sync_timeout` expires.
 
-                server_mtu, server_status = (
-                    resp.json()["server_mtu"],
-                    resp.json()["server_status"],
-                )
+        This is the watchdog of the sync server channel. The flask server is
+        unreachable for a while whenever the server spins its interface down and up,
+        so transient errors are retried every second.
+
+        Args:
+            route: The route of the flask server e.g. '/peer/ready'.
+            wait_for_init: If True, then also wait until the server status is either
+                'INITIALIZED' or 'SHUTDOWN'.
+            retry_statuses: The statuses of the errors that are retried.
 
-                if (server_status == "INITIALIZED") or (server_status == "SHUTDOWN"):
+        Returns:
+            A tuple (server_mtu, server_status), or (None, None) if the sweep was
+            cancelled while waiting.
+
+        Raises:
+            - ReturncodeError if the error is not retried or if the flask server did
+              not respond within `sync_timeout` seconds.
+        """
+        deadline = time.monotonic() + self.sync_timeout
+        while not self.cancelled.is_set():
+            try:
+                server_mtu, server_status = self.__peer_mode__request_sync_server(
+                    route=route
+                )
+                if not wait_for_init or server_status in ["INITIALIZED", "SHUTDOWN"]:
                     print(
                         f"SUCCESS, SERVER_MTU: {server_mtu}, "
                         f"SERVER_STATUS: {server_status}"
                     )
                     return server_mtu, server_status
-                else:
-                    print(f"FAILED, SERVER_STATUS: {server_status}, Retrying...")
-                    time.sleep(1)
-                    continue
-            except requests.exceptions.ConnectTimeout:
-                print("FAILED, ConnectTimeout, Retrying...")
-                time.sleep(1)
-                continue
+                print(f"FAILED, SERVER_STATUS: {server_status}")
+                status = "timeout"
+            except ReturncodeError as e:
+                if e.status not in retry_statuses:
+                    raise
+                status = e.status
+
+            if time.monotonic() >= deadline:
+                print(
+                    f"Sync server did not respond within {self.sync_timeout}s. "
+                    f"Giving up with STATUS: {status}"
+                )
+                raise ReturncodeError(status=status)
+
+            if self.cancelled.wait(1):
+                break
+            msg = f"Retrying {route}"
+            print(f"{msg:<50s}", end=": ")
+
+        print("CANCELLED")
+        return None, None
+
+    def __peer_mode__wait_for_server_init(self):
+        """Get server mtu once the server is initialized or has shutdown.
+
+        Raises:
+            - ReturncodeError if the flask server running on the WG server did not
+              respond within `sync_timeout` seconds.
+        """
+        msg = f"Waiting for server init and status"
+        print(f"{msg:<50s}", end=": ")
+        return self.__peer_mode__sync_with_server(
+            route="/server/status", wait_for_init=True
+        )
 
     def __peer_mode__send_server_peer_ready(self):
-        """Send restart signal to flask server and get back server status."""
+        """Send restart signal to flask server and get back server status.
+
+        The request is only resent if the flask server was unreachable. After a
+        timeout the request may have been handled already and resending it would make
+        the server skip a server MTU.
+        """
         msg = f"Send peer ready for next loop to server"
         print(f"{msg:<50s}", end=": ")
-        resp = requests.get(
-            f"http://{self.server_ip}:{self.server_port}/peer/ready",
-            verify=False,
-            timeout=5,
-        )
-        server_mtu, server_status = (
-            resp.json()["server_mtu"],
-            resp.json()["server_status"],
-        )
-        print("SUCCESS")
-        return server_mtu, server_status
+        try:
+            return self.__peer_mode__sync_with_server(
+                route="/peer/ready", wait_for_init=False, retry_statuses=["unreachable"]
+            )
+        except ReturncodeError as e:
+            if e.status != "timeout":
+                raise
+            print("Continuing with waiting for server init.")
+            return None, None
 
     def __peer_mode__ping_server(self):
         """Ping server to reestablish connection between peer and server.
@@ -293,39 +538,105 @@ class MTUFinder(object):
         """
         msg = f"Pinging server to establish connection"
         print(f"{msg:<50s}", end=": ")
-        process = subprocess.Popen(
-            ["ping", "-c", "1", f"{self.server_ip}"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
+        self.run_command(
+            ["ping", "-c", "1", f"{self.server_ip}"], timeout=self.ping_timeout
         )
 
-        stdout, stderr = process.communicate()
-        self.handle_returncode(
-            returncode=process.returncode, stdout=stdout, stderr=stderr
-        )
+    def __peer_mode__flush_connection(self):
+        """Ping the server but only warn about transient errors.
+
+        The pings around the sync requests only flush the connection, the sync
+        requests themselves are retried until the server responds.
+        """
+        try:
+            self.__peer_mode__ping_server()
+        except ReturncodeError as e:
+            if e.status not in TRANSIENT_STATUSES:
+                raise
+            print(f"Caught transient ReturncodeError with status '{e.status}'.")
+
+    def __peer_mode__set_interface_mtu(self):
+        """Spin the interface down and up again with the current peer MTU."""
+        self.wg_quick_down()
+        self.update_mtu_in_conf_file()
+        self.wg_quick_up()
+
+        # Wait a short while after interface is spun up.
+        time.sleep(1)
+
+    def __peer_mode__run_bandwidth_tests(self):
+        """Set the current peer MTU and run the upload and download tests.
+
+        Transient errors i.e. timeouts, an unreachable server or a busy iperf3 server
+        are retried up to `peer_retries` times with an exponential backoff. This
+        includes the interface being spun down and up, e.g. a wg-quick that is stuck
+        on DNS, which is repeated until it succeeds once.
+
+        Raises:
+            - ReturncodeError if the tests still fail after all retries or if the
+              error is not transient.
+        """
+        interface_mtu_is_set = False
+        for attempt in range(self.peer_retries + 1):
+            try:
+                if not interface_mtu_is_set:
+                    self.__peer_mode__set_interface_mtu()
+                    interface_mtu_is_set = True
+
+                # Ping IP address of server to flush connection
+                self.__peer_mode__ping_server()
+
+                up_rcv_bps, up_snd_bps = self.run_upload_test()
+                time.sleep(1)
+                down_rcv_bps, down_snd_bps = self.run_download_test()
+
+                return up_rcv_bps, up_snd_bps, down_rcv_bps, down_snd_bps
+            except ReturncodeError as e:
+                if (e.status not in TRANSIENT_STATUSES) or (
+                    attempt == self.peer_retries
+                ):
+                    raise
+
+                backoff = self.peer_retry_backoff * (2**attempt)
+                print(
+                    f"Caught transient ReturncodeError with status '{e.status}'. "
+                    f"Retrying in {backoff:0.1f}s "
+                    f"(retry {attempt + 1} of {self.peer_retries})."
+                )
+                if self.cancelled.wait(backoff):
+                    print("Peer sweep was cancelled. Not retrying.")
+                    raise
 
     def run_peer_mode(self):
-        """Run all steps for peer mode.
+        """Run all steps for peer mode and yield a `MTUResult` for every pair.
 
         IMPORTANT: Peer is the one that logs bandwidth into the log file (csv)
         """
         self.create_log()
+        progress = SweepProgress(
+            plan=plan_sweep(
+                mtu_min=self.mtu_min, mtu_max=self.mtu_max, mtu_step=self.mtu_step
+            )
+        )
         while True:
             # Ping IP address of server to flush connection
-            self.__peer_mode__ping_server()
+            self.__peer_mode__flush_connection()
 
             # Tell server that peer is ready for next loop.
             self.__peer_mode__send_server_peer_ready()
 
             # Ping IP address of server to flush connection
-            self.__peer_mode__ping_server()
+            self.__peer_mode__flush_connection()
 
             # Start a fresh loop of cycling through all peer MTUs
             # At start, find what the current server_mtu is.
             self.server_mtu, server_status = self.__peer_mode__wait_for_server_init()
 
-            if server_status == "INITIALIZED":
+            if self.cancelled.is_set():
+                print("Peer sweep was cancelled. Shutting down peer.")
+                print(f"Check partial bandwidth log: {self.log_filepath}")
+                return
+            elif server_status == "INITIALIZED":
                 pass
             elif server_status == "SHUTDOWN":
                 print(f"Server has shutdown... Shutting down peer script.")
@@ -335,7 +646,7 @@ class MTUFinder(object):
                     heatmap_filepath=self.heatmap_filepath,
                 )
                 print(f"Check final bandwidth plot: {self.heatmap_filepath}")
-                sys.exit(0)
+                return
             else:
                 raise NotImplementedError()
 
@@ -343,37 +654,38 @@ class MTUFinder(object):
                 if self.server_mtu is None:
                     raise NotImplementedError()
 
+                if self.cancelled.is_set():
+                    print("Peer sweep was cancelled. Shutting down peer.")
+                    print(f"Check partial bandwidth log: {self.log_filepath}")
+                    return
+
                 self.current_mtu = current_mtu
                 self.peer_mtu = current_mtu
 
                 print("-" * 80)
-                self.wg_quick_down()
-                self.update_mtu_in_conf_file()
-                self.wg_quick_up()
-
-                # Wait a short while after interface is spun up.
-                time.sleep(1)
-
                 try:
-                    # Ping IP address of server to flush connection
-                    self.__peer_mode__ping_server()
-
-                    up_rcv_bps, up_snd_bps = self.run_iperf3_upload_test()
-                    time.sleep(1)
-                    down_rcv_bps, down_snd_bps = self.run_iperf3_download_test()
-
-                    self.append_log_with_bandwidth_info(
+                    (
+                        up_rcv_bps,
+                        up_snd_bps,
+                        down_rcv_bps,
+                        down_snd_bps,
+                    ) = self.__peer_mode__run_bandwidth_tests()
+
+                    result = self.append_log_with_bandwidth_info(
                         up_rcv_bps, up_snd_bps, down_rcv_bps, down_snd_bps
                     )
-                except ReturncodeError:
+                except ReturncodeError as e:
                     if self.peer_skip_errors:
                         print(
                             "Caught ReturncodeError: The --peer-skip-errors flag is "
                             "set to True so this Peer MTU iteration will be skipped. "
                             "Continuing with other peer MTUs. Bandwidth for this MTU "
-                            "will be recorded as -1 in the log file (csv)."
+                            "will be recorded as -1 in the log file (csv) with status "
+                            f"'{e.status}'."
+                        )
+                        result = self.append_log_with_bandwidth_info(
+                            -1, -1, -1, -1, status=e.status
                         )
-                        self.append_log_with_bandwidth_info(-1, -1, -1, -1)
                     else:
                         print(
                             "Caught ReturncodeError: The --peer-skip-errors flag is "
@@ -383,21 +695,21 @@ class MTUFinder(object):
                         )
                         raise
 
-    def run_iperf3_server_test(self):
-        """Run iperf3 upload test."""
-        msg = f"Running iperf3 server"
-        print(f"{msg:<50s}", end=": ")
-        process = subprocess.Popen(
-            ["iperf3", "-s"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-        )
+                progress.update()
+                yield result
 
-        time.sleep(1)
-        print("SUCCESS")
+    def __server_mode__wait_for_sync_server(self, from_server_queue):
+        """Wait for the next message from the sync server.
 
-        return process
+        Returns:
+            The message, or None if the sweep was cancelled while waiting.
+        """
+        while not self.cancelled.is_set():
+            try:
+                return from_server_queue.get(block=True, timeout=1)
+            except queue.Empty:
+                continue
+        return None
 
     def run_server_mode(self):
         """Run all steps for server mode."""
@@ -419,65 +731,81 @@ class MTUFinder(object):
             },
         )
 
-        iperf3_server_process = None
+        # The iperf3 server or the built-in throughput server stays resident for the
+        # whole sweep.
+        iperf3_server = Iperf3Server(port=self.iperf3_port)
+        throughput_server = None
+        if self.engine == "builtin":
+            throughput_server = ThroughputServer(port=self.builtin_port)
+            throughput_server.start()
+
         mtu_range = list(range(self.mtu_min, self.mtu_max + 1, self.mtu_step))
         mtu_range_iter = iter(mtu_range)
 
-        while True:
-            print("-" * 80)
-            # Wait for init command from sync server
-            sync_server_status = from_server_queue.get(block=True)
-
-            # Any time a message is received from the sync_server, the iperf3 server
-            # must be terminated.
-            if iperf3_server_process:
-                iperf3_server_process.terminate()
-
-            if sync_server_status == "INITIALIZE":
-                # We receive INITIALIZE from the peer but sometimes the connection is
-                # spun down too quickly before a response could be sent. Therefore
-                # we'll wait for a little while until the request has been handled.
-                time.sleep(1)
+        try:
+            while True:
+                print("-" * 80)
+                # Wait for init command from sync server
+                sync_server_status = self.__server_mode__wait_for_sync_server(
+                    from_server_queue=from_server_queue
+                )
 
-                try:
-                    self.current_mtu = next(mtu_range_iter)
-                except StopIteration:
-                    # Done with cycling through all MTUs
-                    # Send Shutdown signal to the sync_server
-                    # And go back to waiting for shutdown signal from sync_server
-                    to_server_queue.put(
-                        {"server_mtu": self.server_mtu, "server_status": "SHUTDOWN"}
-                    )
-                    continue
+                if sync_server_status is None:
+                    print("Server sweep was cancelled. Shutting down.")
+                    return
+
+                elif sync_server_status == "INITIALIZE":
+                    # We receive INITIALIZE from the peer but sometimes the connection
+                    # is spun down too quickly before a response could be sent.
+                    # Therefore we'll wait for a little while until the request has
+                    # been handled.
+                    time.sleep(1)
 
-                self.server_mtu = self.current_mtu
+                    try:
+                        self.current_mtu = next(mtu_range_iter)
+                    except StopIteration:
+                        # Done with cycling through all MTUs
+                        # Send Shutdown signal to the sync_server
+                        # And go back to waiting for shutdown signal from sync_server
+                        to_server_queue.put(
+                            {"server_mtu": self.server_mtu, "server_status": "SHUTDOWN"}
+                        )
+                        continue
 
-                self.wg_quick_down()
-                self.update_mtu_in_conf_file()
-                self.wg_quick_up()
+                    self.server_mtu = self.current_mtu
 
-                iperf3_server_process = self.run_iperf3_server_test()
+                    self.wg_quick_down()
+                    self.update_mtu_in_conf_file()
+                    self.wg_quick_up()
 
-                # Wait a short while after interface is spun up.
-                time.sleep(1)
+                    # Wait a short while after interface is spun up.
+                    time.sleep(1)
 
-                to_server_queue.put(
-                    {"server_mtu": self.server_mtu, "server_status": "INITIALIZED"}
-                )
+                    # Make sure the iperf3 server is listening before telling the
+                    # peer that the server is initialized.
+                    if self.engine == "iperf3":
+                        iperf3_server.ensure_running()
 
-                # Now wait for peer to ping our server
-                # Peer will get a response that tells it that the iperf3 server is
-                # ready with the current_mtu.
-                # Peer will start cycling through all of its MTUs
-                # Peer will send another "init" command if it needs the server to
+                    to_server_queue.put(
+                        {"server_mtu": self.server_mtu, "server_status": "INITIALIZED"}
+                    )
 
-            elif sync_server_status == "SHUTDOWN":
-                time.sleep(2)
-                print("Received 'SHUTDOWN' signal from sync server. Shutting down.")
-                sys.exit(0)
+                    # Now wait for peer to ping our server
+                    # Peer will get a response that tells it that the iperf3 server is
+                    # ready with the current_mtu.
+                    # Peer will start cycling through all of its MTUs
+                    # Peer will send another "init" command if it needs the server to
 
-            else:
-                raise NotImplementedError()
+                elif sync_server_status == "SHUTDOWN":
+                    time.sleep(2)
+                    print("Received 'SHUTDOWN' signal from sync server. Shutting down.")
+                    return
 
-        # Code should not reach here.
-        raise NotImplementedError()
+                else:
+                    raise NotImplementedError()
+        finally:
+            iperf3_server.stop()
+            if throughput_server:
+                throughput_server.stop()
+            pool.terminate()
+            manager.shutdown()
@@ -0,0 +1,170 @@
+import time
+
+from pydantic import BaseModel
+
+# Configured per-phase costs in seconds. They are rough averages of a sweep between
+# two VMs and are only used when no log file (csv) of a previous sweep is available.
+WG_CYCLE_SECONDS = 3.0  # wg-quick down, sed and wg-quick up
+SETTLE_SECONDS = 1.0  # Sleep after the interface is spun up.
+PING_SECONDS = 0.5
+IPERF3_TEST_SECONDS = 6.0  # 5 seconds of test plus connection setup.
+IPERF3_PAUSE_SECONDS = 1.0  # Sleep between the upload and download test.
+SYNC_SECONDS = 2.0  # peer/ready request and waiting for the server status.
+
+DEFAULT_PAIR_SECONDS = (
+    WG_CYCLE_SECONDS
+    + SETTLE_SECONDS
+    + PING_SECONDS
+    + 2 * IPERF3_TEST_SECONDS
+    + IPERF3_PAUSE_SECONDS
+)
+DEFAULT_SERVER_RESTART_SECONDS = (
+    SETTLE_SECONDS  # Server waits before spinning down the interface.
+    + WG_CYCLE_SECONDS
+    + SETTLE_SECONDS  # Server waits for the iperf3 server to start.
+    + SETTLE_SECONDS
+    + 2 * PING_SECONDS
+    + SYNC_SECONDS
+)
+
+
+class SweepPlanModel(BaseModel):
+    n_server_mtus: int
+    n_peer_mtus: int
+    n_pairs: int
+    n_server_restarts: int
+
+    pair_seconds: float
+    server_restart_seconds: float
+    estimated_seconds: float
+
+
+def validate_mtu_range(mtu_min, mtu_max):
+    """Validate the MTU range which is shared by the server and the peer."""
+    if not (1280 <= mtu_min <= 1500):
+        raise ValueError(f"mtu_min: {mtu_min} must be in range [1280, 1500].")
+
+    if not (1280 <= mtu_max <= 1500):
+        raise ValueError(f"mtu_max: {mtu_max} must be in range [1280, 1500].")
+
+    if not (mtu_min <= mtu_max):
+        raise ValueError(
+            f"mtu_min: {mtu_min} must be less than or equal to mtu_max: {mtu_max}"
+        )
+
+
+def estimate_costs_from_log(log_filepath):
+    """Measure the per-pair and per-server-restart costs from a previous sweep.
+
+    The durations are derived from the `timestamp` column of the log file (csv). The
+    median is used so that a few retried or timed out pairs do not skew the estimate.
+
+    Returns:
+        A tuple (pair_seconds, server_restart_seconds). Either one is None if it could
+        not be measured from the log file.
+    """
+    # pandas is only imported when needed so that importing the planner stays cheap.
+    import pandas as pd
+
+    df = pd.read_csv(log_filepath)
+    if "timestamp" not in df.columns:
+        raise ValueError(
+            f"Expected to find a 'timestamp' column in {log_filepath} but it was not "
+            f"found. Log files created by older versions cannot be used for planning."
+        )
+
+    # The peer loops through all peer MTUs for one server MTU before the server
+    # restarts with the next server MTU, so a change of server MTU marks a restart.
+    durations = df["timestamp"].diff()
+    is_restart = df["server_mtu"].ne(df["server_mtu"].shift())
+
+    pair_durations = durations[~is_restart].dropna()
+    restart_durations = durations[is_restart].dropna()
+
+    pair_seconds = float(pair_durations.median()) if len(pair_durations) else None
+    server_restart_seconds = (
+        max(float(restart_durations.median()) - pair_seconds, 0.0)
+        if (len(restart_durations) and pair_seconds is not None)
+        else None
+    )
+    return pair_seconds, server_restart_seconds
+
+
+def plan_sweep(
+    mtu_min,
+    mtu_max,
+    mtu_step,
+    pair_seconds=DEFAULT_PAIR_SECONDS,
+    server_restart_seconds=DEFAULT_SERVER_RESTART_SECONDS,
+):
+    """Compute the size of a sweep and estimate how long it will take.
+
+    The server and the peer loop through the same MTU range. For every server MTU the
+    server restarts once and the peer tests all of its MTUs.
+    """
+    n_mtus = len(range(mtu_min, mtu_max + 1, mtu_step))
+    n_pairs = n_mtus * n_mtus
+    return SweepPlanModel(
+        n_server_mtus=n_mtus,
+        n_peer_mtus=n_mtus,
+        n_pairs=n_pairs,
+        n_server_restarts=n_mtus,
+        pair_seconds=pair_seconds,
+        server_restart_seconds=server_restart_seconds,
+        estimated_seconds=n_pairs * pair_seconds + n_mtus * server_restart_seconds,
+    )
+
+
+def format_duration(seconds):
+    """Format seconds like '3d04h05m', '4h05m' or '5m07s'."""
+    seconds = int(round(seconds))
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}d{hours:02d}h{minutes:02d}m"
+    elif hours:
+        return f"{hours}h{minutes:02d}m"
+    else:
+        return f"{minutes}m{seconds:02d}s"
+
+
+class SweepProgress(object):
+    def __init__(self, plan):
+        """Track the progress of a sweep and estimate the time remaining.
+
+        Until the first pair is done the ETA is based on the plan. Afterwards it is
+        based on the observed average time per pair, which includes the amortized
+        cost of the server restarts.
+        """
+        self.plan = plan
+        self.n_done = 0
+        self.started_at = time.time()
+
+    @property
+    def elapsed_seconds(self):
+        return time.time() - self.started_at
+
+    @property
+    def pairs_per_hour(self):
+        if self.n_done == 0:
+            return 3600 * self.plan.n_pairs / self.plan.estimated_seconds
+        return 3600 * self.n_done / self.elapsed_seconds
+
+    @property
+    def eta_seconds(self):
+        n_remaining = max(self.plan.n_pairs - self.n_done, 0)
+        return 3600 * n_remaining / self.pairs_per_hour
+
+    def update(self):
+        """Mark one more pair as done and print the progress line."""
+        self.n_done += 1
+        msg = "Progress"
+        print(
+            f"{msg:<50s}: "
+            f"{self.n_done}/{self.plan.n_pairs} pairs "
+            f"({100 * self.n_done / self.plan.n_pairs:0.1f}%), "
+            f"{self.pairs_per_hour:0.1f} pairs/h, "
+            f"elapsed {format_duration(self.elapsed_seconds)}, "
+            f"ETA {format_duration(self.eta_seconds)}"
+        )
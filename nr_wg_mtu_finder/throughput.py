@@ -0,0 +1,351 @@
+"""A built-in throughput tester that can be used instead of iperf3.
+
+The server stays resident for the whole sweep and the client keeps a persistent
+control connection to it, so no process has to be spawned per test.
+
+Protocol: Every TCP connection starts with a json header line.
+- {"role": "control"}: A control connection. The client sends json command lines like
+  {"cmd": "upload", "duration": 5, "token": "..."} and the server replies with a json
+  line of its side of the results, e.g. {"bytes": 123, "seconds": 5.0}.
+- {"role": "data", "token": "..."}: A data connection for the command with the same
+  token. A fresh data connection is used for every test so that TCP negotiates its MSS
+  for the current MTU.
+"""
+import json
+import os
+import queue
+import socket
+import tempfile
+import threading
+import time
+import uuid
+
+BUFFER_SIZE = 128 * 1024
+
+# How long the server waits for the data connection of a command, and for the command
+# of a data connection.
+DATA_CONNECTION_TIMEOUT = 10
+
+
+def recv_line(sock):
+    """Receive a single line without reading past it.
+
+    The socket is read byte by byte so that no data after the line is consumed. Only
+    used for the short json headers and commands.
+    """
+    line = bytearray()
+    while True:
+        byte = sock.recv(1)
+        if not byte:
+            raise ConnectionError("Connection closed before a full line was received.")
+        if byte == b"\n":
+            return json.loads(line.decode())
+        line += byte
+
+
+def send_line(sock, message):
+    """Send a json line."""
+    sock.sendall(f"{json.dumps(message)}\n".encode())
+
+
+def send_for(sock, duration, payload_file):
+    """Send the payload over and over for `duration` seconds and close for writing.
+
+    `socket.sendfile` uses `os.sendfile` where available, so the payload is sent
+    straight from the page cache without being copied into python.
+
+    Returns:
+        A tuple (bytes sent, seconds).
+    """
+    n_bytes = 0
+    started_at = time.perf_counter()
+    deadline = started_at + duration
+    while time.perf_counter() < deadline:
+        n_bytes += sock.sendfile(payload_file, offset=0, count=BUFFER_SIZE)
+    seconds = time.perf_counter() - started_at
+    sock.shutdown(socket.SHUT_WR)
+    return n_bytes, seconds
+
+
+def receive_all(sock):
+    """Receive until the other side closes for writing.
+
+    The time is measured from the first received byte so that connection setup is
+    not counted.
+
+    Returns:
+        A tuple (bytes received, seconds).
+    """
+    buffer = memoryview(bytearray(BUFFER_SIZE))
+    n_bytes = sock.recv_into(buffer)
+    started_at = time.perf_counter()
+    while True:
+        n = sock.recv_into(buffer)
+        if n == 0:
+            break
+        n_bytes += n
+    return n_bytes, time.perf_counter() - started_at
+
+
+def create_payload_file():
+    """Create a temporary file with one buffer of random bytes to send from."""
+    payload_file = tempfile.TemporaryFile()
+    payload_file.write(os.urandom(BUFFER_SIZE))
+    payload_file.flush()
+    return payload_file
+
+
+def to_bps(n_bytes, seconds):
+    """Convert bytes over seconds to bits per second."""
+    return 8 * n_bytes / seconds if seconds > 0 else 0.0
+
+
+class ThroughputServer(object):
+    def __init__(self, host="0.0.0.0", port=5202):
+        """Init.
+
+        The server listens on all addresses by default so that it keeps working when
+        the WG interface is spun down and up again.
+        """
+        self.host = host
+        self.port = port
+
+        self.listen_socket = None
+        self.accept_thread = None
+        self.stopped = threading.Event()
+        self.payload_file = None
+
+        self.control_connections = set()
+        # Token to the queue of a command that waits for its data connection.
+        self.data_connections = {}
+        self.lock = threading.Lock()
+        self.data_connections_changed = threading.Condition(self.lock)
+
+    def start(self):
+        """Start listening in a background thread.
+
+        If `port` is 0, then a free port is picked and `port` is updated.
+        """
+        msg = f"Starting built-in throughput server"
+        print(f"{msg:<50s}", end=": ")
+        self.payload_file = create_payload_file()
+        self.listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listen_socket.bind((self.host, self.port))
+        self.port = self.listen_socket.getsockname()[1]
+        self.listen_socket.listen()
+        # Closing the listening socket does not interrupt a blocking accept, so the
+        # accept loop polls for the stop event instead.
+        self.listen_socket.settimeout(1)
+        self.accept_thread = threading.Thread(target=self.accept_loop, daemon=True)
+        self.accept_thread.start()
+        print(f"SUCCESS, listening on {self.host}:{self.port}")
+
+    def stop(self):
+        """Stop listening and wait for the background thread to finish."""
+        self.stopped.set()
+        if self.accept_thread:
+            self.accept_thread.join()
+        if self.listen_socket:
+            self.listen_socket.close()
+        with self.lock:
+            for conn in self.control_connections:
+                try:
+                    conn.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        if self.payload_file:
+            self.payload_file.close()
+
+    def accept_loop(self):
+        """Accept connections until the server is stopped."""
+        while not self.stopped.is_set():
+            try:
+                conn, _ = self.listen_socket.accept()
+            except socket.timeout:
+                continue
+            threading.Thread(
+                target=self.handle_connection, args=(conn,), daemon=True
+            ).start()
+
+    def register_data_connection(self, token):
+        """Register the token of a command and get the queue for its data connection."""
+        with self.data_connections_changed:
+            data_connection_queue = self.data_connections[token] = queue.Queue(1)
+            self.data_connections_changed.notify_all()
+        return data_connection_queue
+
+    def unregister_data_connection(self, token, data_connection_queue):
+        """Unregister the token of a command.
+
+        No data connection can be handed over once the token is unregistered. A data
+        connection that was handed over after the command gave up on it is closed.
+        """
+        with self.lock:
+            self.data_connections.pop(token, None)
+        try:
+            data_connection_queue.get_nowait().close()
+        except queue.Empty:
+            pass
+
+    def hand_over_data_connection(self, token, conn):
+        """Hand a data connection over to the command with the same token.
+
+        The command can arrive on the control connection after its data connection,
+        so the token is waited for. A data connection whose token is not registered
+        within `DATA_CONNECTION_TIMEOUT` seconds, e.g. because it arrived after the
+        command gave up on it, is closed.
+        """
+        with self.data_connections_changed:
+            if self.data_connections_changed.wait_for(
+                lambda: token in self.data_connections,
+                timeout=DATA_CONNECTION_TIMEOUT,
+            ):
+                try:
+                    self.data_connections[token].put_nowait(conn)
+                    return
+                except queue.Full:
+                    pass
+        conn.close()
+
+    def handle_connection(self, conn):
+        """Handle a new connection according to its header."""
+        try:
+            header = recv_line(conn)
+            if header["role"] == "control":
+                with self.lock:
+                    self.control_connections.add(conn)
+                try:
+                    with conn:
+                        self.handle_control_connection(conn)
+                finally:
+                    with self.lock:
+                        self.control_connections.discard(conn)
+            elif header["role"] == "data":
+                # The data connection is closed by the control connection once the
+                # test is done.
+                self.hand_over_data_connection(header["token"], conn)
+            else:
+                conn.close()
+        except (OSError, ValueError, KeyError):
+            conn.close()
+
+    def handle_control_connection(self, conn):
+        """Run the commands of a control connection until it is closed."""
+        while True:
+            try:
+                command = recv_line(conn)
+            except OSError:
+                return
+
+            data_connection_queue = self.register_data_connection(command["token"])
+            try:
+                data_conn = data_connection_queue.get(timeout=DATA_CONNECTION_TIMEOUT)
+            except queue.Empty:
+                send_line(conn, {"error": "data connection was not received"})
+                continue
+            finally:
+                self.unregister_data_connection(command["token"], data_connection_queue)
+
+            with data_conn:
+                data_conn.settimeout(command["duration"] + DATA_CONNECTION_TIMEOUT)
+                try:
+                    if command["cmd"] == "upload":
+                        n_bytes, seconds = receive_all(data_conn)
+                    elif command["cmd"] == "download":
+                        n_bytes, seconds = send_for(
+                            data_conn, command["duration"], self.payload_file
+                        )
+                    else:
+                        send_line(conn, {"error": f"unknown command {command['cmd']}"})
+                        continue
+                except OSError as e:
+                    send_line(conn, {"error": f"data connection failed: {e}"})
+                    continue
+
+            send_line(conn, {"bytes": n_bytes, "seconds": seconds})
+
+
+class ThroughputClient(object):
+    def __init__(self, host, port=5202, duration=5, timeout=30):
+        """Init.
+
+        Args:
+            host: IP address of the `ThroughputServer`.
+            port: Port of the `ThroughputServer`.
+            duration: Seconds that every upload or download test runs for.
+            timeout: Seconds after which a connect, send or receive is given up.
+        """
+        self.host = host
+        self.port = port
+        self.duration = duration
+        self.timeout = timeout
+
+        self.control_socket = None
+        self.payload_file = create_payload_file()
+
+    def connect(self):
+        """Open a new connection to the server."""
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def close(self):
+        """Close the control connection and the payload file."""
+        if self.control_socket:
+            self.control_socket.close()
+            self.control_socket = None
+        self.payload_file.close()
+
+    def run_test(self, cmd):
+        """Run an upload or download test.
+
+        The control connection is opened on first use and reopened after an error, in
+        case it did not survive the WG interface being spun down and up.
+
+        Returns:
+            A tuple (receiver bits per second, sender bits per second).
+        """
+        try:
+            if self.control_socket is None:
+                self.control_socket = self.connect()
+                send_line(self.control_socket, {"role": "control"})
+
+            token = uuid.uuid4().hex
+            send_line(
+                self.control_socket,
+                {"cmd": cmd, "duration": self.duration, "token": token},
+            )
+            with self.connect() as data_conn:
+                send_line(data_conn, {"role": "data", "token": token})
+                if cmd == "upload":
+                    n_bytes, seconds = send_for(
+                        data_conn, self.duration, self.payload_file
+                    )
+                else:
+                    n_bytes, seconds = receive_all(data_conn)
+
+            result = recv_line(self.control_socket)
+        except (OSError, ValueError):
+            if self.control_socket:
+                self.control_socket.close()
+                self.control_socket = None
+            raise
+
+        if "error" in result:
+            raise ConnectionError(f"Throughput server error: {result['error']}")
+
+        client_bps = to_bps(n_bytes, seconds)
+        server_bps = to_bps(result["bytes"], result["seconds"])
+        if cmd == "upload":
+            return server_bps, client_bps
+        else:
+            return client_bps, server_bps
+
+    def run_upload_test(self):
+        """Run an upload test from the client to the server."""
+        return self.run_test("upload")
+
+    def run_download_test(self):
+        """Run a download test from the server to the client."""
+        return self.run_test("download")